@@ -7,7 +7,7 @@ import asyncio
 from typing import Dict, Optional, List
 import os
 import json
-from datetime import datetime
+import time
 
 from config import config
 from logging_setup import logger, log_api_call
@@ -105,7 +105,7 @@ class AmbientLLMClient:
             "max_tokens": 500
         }
         
-        start_time = datetime.now()
+        start_time = time.perf_counter_ns()
         
         async def _call_api():
             url = f"{self.base_url}/v1/completions"
@@ -126,13 +126,13 @@ class AmbientLLMClient:
                 )
             )
             
-            duration_ms = (datetime.now() - start_time).total_seconds() * 1000
+            duration_ms = (time.perf_counter_ns() - start_time) / 1e6
             log_api_call("Ambient", "/v1/completions", "success", duration_ms)
             
             return result
         
         except Exception as e:
-            duration_ms = (datetime.now() - start_time).total_seconds() * 1000
+            duration_ms = (time.perf_counter_ns() - start_time) / 1e6
             log_api_call("Ambient", "/v1/completions", f"error: {e}", duration_ms)
             raise e
     
@@ -2,8 +2,8 @@
 SenseForge Database Repository
 Handles persistence for checkpoints and training data.
 """
-from typing import Optional, Dict, List, Any
-from datetime import datetime
+from typing import Optional, Dict, List, Any, Tuple
+from datetime import datetime, timezone
 import json
 import os
 
@@ -32,7 +32,7 @@ class CheckpointRepository:
                 'final_loss': final_loss,
                 'training_samples': training_samples,
                 'notes': notes,
-                'timestamp': datetime.utcnow().isoformat(),
+                'timestamp': datetime.now(timezone.utc).isoformat(),
                 **(metadata or {})
             }
         )
@@ -88,6 +88,8 @@ class CheckpointRepository:
 class TrainingRepository:
     """Repository for training episodes"""
     
+    episodes_file: str = 'data/training_episodes.jsonl'
+    
     @classmethod
     def add_episode(cls, initial_state: Dict, action: float, next_state: Dict):
         """Add training episode"""
@@ -95,10 +97,28 @@ class TrainingRepository:
             'initial_state': initial_state,
             'action': action,
             'next_state': next_state,
-            'timestamp': datetime.utcnow().isoformat()
+            'timestamp': datetime.now(timezone.utc).isoformat()
         }
         
         # Append to JSONL file
-        os.makedirs('data', exist_ok=True)
-        with open('data/training_episodes.jsonl', 'a') as f:
+        os.makedirs(os.path.dirname(cls.episodes_file) or '.', exist_ok=True)
+        with open(cls.episodes_file, 'a') as f:
             f.write(json.dumps(episode) + '\n')
+    
+    @classmethod
+    def add_episodes(cls, episodes: List[Tuple[Dict, float, Dict]]):
+        """Add (initial_state, action, next_state) episodes in one append"""
+        timestamp = datetime.now(timezone.utc).isoformat()
+        lines = [
+            json.dumps({
+                'initial_state': initial_state,
+                'action': action,
+                'next_state': next_state,
+                'timestamp': timestamp
+            }) + '\n'
+            for initial_state, action, next_state in episodes
+        ]
+        
+        os.makedirs(os.path.dirname(cls.episodes_file) or '.', exist_ok=True)
+        with open(cls.episodes_file, 'a') as f:
+            f.writelines(lines)
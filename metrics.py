@@ -8,6 +8,8 @@ from datetime import datetime
 from pathlib import Path
 import numpy as np
 
+from serialization import dumps, utc_now_iso
+
 class MetricsTracker:
     """Tracks and analyzes agent performance metrics"""
     
@@ -16,6 +18,9 @@ class MetricsTracker:
         self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
         self.predictions: List[Dict] = []
         self.training_history: List[float] = []
+        # Bumped on every change; invalidates the cached dashboard snapshot
+        self._generation = 0
+        self._snapshot: Optional[tuple] = None  # ((generation, limit), bytes)
         self.load_metrics()
     
     def load_metrics(self):
@@ -25,9 +30,12 @@ class MetricsTracker:
                 data = json.load(f)
                 self.predictions = data.get('predictions', [])
                 self.training_history = data.get('training_history', [])
+        self._generation += 1
     
     def save_metrics(self):
         """Save metrics to file"""
+        # Every mutation is persisted through here
+        self._generation += 1
         data = {
             'predictions': self.predictions,
             'training_history': self.training_history,
@@ -123,6 +131,25 @@ class MetricsTracker:
         """Get recent predictions"""
         return self.predictions[-limit:]
     
+    def get_snapshot_bytes(self, recent_limit: int = 10) -> bytes:
+        """
+        Dashboard snapshot (accuracy, training, recent predictions) as JSON.
+        
+        The members are serialized once per metrics change and reused until
+        the next one; only the trailing 'timestamp' is filled in on each call.
+        """
+        key = (self._generation, recent_limit)
+        if self._snapshot is None or self._snapshot[0] != key:
+            # Object assembled by hand, up to the open timestamp string
+            prefix = b''.join((
+                b'{"accuracy":', dumps(self.get_accuracy_stats()),
+                b',"training":', dumps(self.get_training_stats()),
+                b',"recent_predictions":', dumps(self.get_recent_predictions(limit=recent_limit)),
+                b',"timestamp":"',
+            ))
+            self._snapshot = (key, prefix)
+        return self._snapshot[1] + utc_now_iso().encode() + b'"}'
+    
     def clear_metrics(self):
         """Clear all metrics (use with caution)"""
         self.predictions = []
@@ -8,13 +8,37 @@ import torch.optim as optim
 from collections import deque
 import random
 import os
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Optional, Dict, List
 
 from database.repository import CheckpointRepository, TrainingRepository
 from metrics import metrics
 from logging_setup import logger
 
+# Order of the state vector fields
+STATE_KEYS = ('liquidity_depth', 'volatility_index', 'governance_risk_score')
+
+class ExperienceReplayBuffer:
+    """Fixed-capacity FIFO of (state, action, next_state) transitions"""
+    
+    def __init__(self, capacity: int = 10000):
+        self.buffer = deque(maxlen=capacity)
+    
+    def push(self, state, action, next_state):
+        """Add one transition, evicting the oldest when full"""
+        self.buffer.append((state, action, next_state))
+    
+    def extend(self, transitions):
+        """Add an iterable of (state, action, next_state) transitions"""
+        self.buffer.extend(transitions)
+    
+    def sample(self, batch_size: int) -> List:
+        """Random batch of transitions, without replacement"""
+        return random.sample(list(self.buffer), batch_size)
+    
+    def __len__(self):
+        return len(self.buffer)
+
 class LiquidityJEPA(nn.Module):
     """Enhanced JEPA model with production features"""
     
@@ -42,7 +66,7 @@ class LiquidityJEPA(nn.Module):
         
         self.optimizer = optim.Adam(self.parameters(), lr=0.001)
         self.loss_fn = nn.MSELoss()
-        self.replay_buffer = deque(maxlen=10000)
+        self.replay_buffer = ExperienceReplayBuffer(capacity=10000)
         self.training_history: List[float] = []
         
         logger.info("LiquidityJEPA initialized")
@@ -68,12 +92,13 @@ class LiquidityJEPA(nn.Module):
         epoch_losses = []
         
         for _ in range(num_batches):
-            batch = random.sample(list(self.replay_buffer), batch_size)
+            batch = self.replay_buffer.sample(batch_size)
             
+            # Each sample is (1, dim); concatenate into (batch_size, dim)
             states, actions, next_states = zip(*batch)
-            states_tensor = torch.stack(list(states))
-            actions_tensor = torch.stack(list(actions))
-            next_states_tensor = torch.stack(list(next_states))
+            states_tensor = torch.cat(states)
+            actions_tensor = torch.cat(actions)
+            next_states_tensor = torch.cat(next_states)
             
             loss = self.train_step(states_tensor, actions_tensor, next_states_tensor)
             epoch_losses.append(loss)
@@ -98,6 +123,27 @@ class LiquidityJEPA(nn.Module):
         
         return loss.item()
     
+    def get_training_stats(self) -> Dict:
+        """Loss statistics over this model's training history"""
+        if not self.training_history:
+            return {
+                'epochs_trained': 0,
+                'initial_loss': None,
+                'current_loss': None,
+                'improvement': None
+            }
+        
+        initial_loss = self.training_history[0]
+        current_loss = self.training_history[-1]
+        improvement = ((initial_loss - current_loss) / initial_loss) * 100
+        
+        return {
+            'epochs_trained': len(self.training_history),
+            'initial_loss': initial_loss,
+            'current_loss': current_loss,
+            'improvement': improvement
+        }
+    
     def add_experience(self, state_dict: Dict, action_value: float, next_state_dict: Dict):
         """Add experience to replay buffer and database"""
         
@@ -115,7 +161,7 @@ class LiquidityJEPA(nn.Module):
             next_state_dict['governance_risk_score']
         ]], dtype=torch.float32)
         
-        self.replay_buffer.append((state_tensor, action_tensor, next_state_tensor))
+        self.replay_buffer.push(state_tensor, action_tensor, next_state_tensor)
         
         # Also save to database for persistent training data
         try:
@@ -127,6 +173,33 @@ class LiquidityJEPA(nn.Module):
         except Exception as e:
             logger.error(f"Failed to save training episode to database: {e}")
     
+    def add_experiences_batch(self, states, actions, next_states):
+        """
+        Add N experiences from (N, 3) state, (N,) or (N, 1) action and
+        (N, 3) next-state arrays, converting each array to a tensor once
+        """
+        # float64 copies are what gets persisted, matching add_experience
+        states = torch.as_tensor(states, dtype=torch.float64)
+        actions = torch.as_tensor(actions, dtype=torch.float64).reshape(len(states), -1)
+        next_states = torch.as_tensor(next_states, dtype=torch.float64)
+        
+        # (1, dim) row views, the same shape add_experience stores
+        self.replay_buffer.extend(zip(
+            states.float().split(1),
+            actions.float().split(1),
+            next_states.float().split(1)
+        ))
+        
+        try:
+            TrainingRepository.add_episodes([
+                (dict(zip(STATE_KEYS, state)), action[0], dict(zip(STATE_KEYS, next_state)))
+                for state, action, next_state in zip(
+                    states.tolist(), actions.tolist(), next_states.tolist()
+                )
+            ])
+        except Exception as e:
+            logger.error(f"Failed to save training episodes to database: {e}")
+    
     def save_checkpoint_versioned(self, version: Optional[str] = None, notes: Optional[str] = None):
         """Save checkpoint with version tracking"""
         
@@ -136,16 +209,7 @@ class LiquidityJEPA(nn.Module):
         filepath = f"checkpoints/jepa_model_{version}.pth"
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
         
-        checkpoint = {
-            'model_state_dict': self.state_dict(),
-            'optimizer_state_dict': self.optimizer.state_dict(),
-            'training_history': self.training_history,
-            'replay_buffer_size': len(self.replay_buffer),
-            'version': version,
-            'timestamp': datetime.utcnow().isoformat()
-        }
-        
-        torch.save(checkpoint, filepath)
+        torch.save(self._checkpoint_state(version), filepath)
         
         # Save metadata to database
         try:
@@ -189,25 +253,55 @@ class LiquidityJEPA(nn.Module):
             logger.error(f"Checkpoint file not found: {filepath}")
             return False
         
-        checkpoint = torch.load(filepath)
+        self._restore_checkpoint(torch.load(filepath))
+        logger.info(f"Checkpoint loaded from {filepath}")
+        
+        return True
+    
+    def _checkpoint_state(self, version: Optional[str]) -> Dict:
+        """Everything a checkpoint file stores"""
+        return {
+            'model_state_dict': self.state_dict(),
+            'optimizer_state_dict': self.optimizer.state_dict(),
+            'training_history': self.training_history,
+            'replay_buffer_size': len(self.replay_buffer),
+            'version': version,
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+    
+    def _restore_checkpoint(self, checkpoint: Dict):
+        """Load model, optimizer and history from a checkpoint dict"""
         self.load_state_dict(checkpoint['model_state_dict'])
         self.optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
         self.training_history = checkpoint['training_history']
         
-        logger.info(f"Checkpoint loaded from {filepath}")
-        
         # Update metrics
         if self.training_history:
             metrics.track_training(self.training_history[-1])
-        
-        return True
     
     # Keep existing methods for backward compatibility
-    def save_checkpoint(self, filepath='checkpoints/jepa_model.pth'):
-        """Legacy save method"""
-        return self.save_checkpoint_versioned()
+    def save_checkpoint(self, filepath: Optional[str] = None):
+        """Legacy save method; writes to filepath, or a new version if None"""
+        if filepath is None:
+            return self.save_checkpoint_versioned()
+        
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
+        torch.save(self._checkpoint_state(version=None), filepath)
+        logger.info(f"Checkpoint saved: {filepath}")
+        
+        return filepath
     
-    def load_checkpoint(self, filepath='checkpoints/jepa_model.pth'):
-        """Legacy load method"""
-        return self.load_checkpoint_versioned()
+    def load_checkpoint(self, filepath: Optional[str] = None) -> bool:
+        """Legacy load method; reads filepath, or the latest version if None"""
+        if filepath is None:
+            return self.load_checkpoint_versioned()
+        
+        if not os.path.exists(filepath):
+            logger.error(f"Checkpoint file not found: {filepath}")
+            return False
+        
+        self._restore_checkpoint(torch.load(filepath))
+        logger.info(f"Checkpoint loaded from {filepath}")
+        
+        return True
 
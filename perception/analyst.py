@@ -31,8 +31,38 @@ class MarketState(BaseModel):
     governance_risk_score: float
     timestamp: datetime = Field(default_factory=datetime.now)
 
+async def take(agen, n: int, timeout: float) -> list:
+    """
+    Pull up to n items from an async generator within timeout seconds.
+    The generator is always closed, even when the timeout fires.
+    """
+    if n <= 0:
+        await agen.aclose()
+        return []
+    
+    buf = [None] * n
+    count = 0
+    try:
+        async with asyncio.timeout(timeout):
+            async for item in agen:
+                buf[count] = item
+                count += 1
+                if count >= n:
+                    break
+    except TimeoutError:
+        pass
+    finally:
+        await agen.aclose()
+    del buf[count:]
+    return buf
+
 # --- Cambrian HTTP Client ---
 
+# Connection pool for the Cambrian session; keep-alive lets repeated polls
+# reuse an open TLS connection instead of handshaking each time
+CAMBRIAN_POOL_LIMIT = 128
+CAMBRIAN_KEEPALIVE_SECONDS = 60
+
 class CambrianHTTPClient:
     """HTTP client for Cambrian on-chain data API"""
     
@@ -47,10 +77,15 @@ class CambrianHTTPClient:
             headers = {}
             if self.api_key:
                 headers["X-API-KEY"] = self.api_key
-            self.session = aiohttp.ClientSession(headers=headers)
+            connector = aiohttp.TCPConnector(
+                limit=CAMBRIAN_POOL_LIMIT,
+                keepalive_timeout=CAMBRIAN_KEEPALIVE_SECONDS,
+                ttl_dns_cache=300
+            )
+            self.session = aiohttp.ClientSession(headers=headers, connector=connector)
     
     async def close(self):
-        """Close the HTTP session"""
+        """Close the HTTP session (and its connection pool)"""
         if self.session and not self.session.closed:
             await self.session.close()
     
@@ -89,9 +124,10 @@ class CambrianHTTPClient:
 # --- The Analyst Agent ---
 
 class AnalystAgent:
-    def __init__(self, source: str = "cambrian-api", mode: str = "mock"):
+    def __init__(self, source: str = "cambrian-api", mode: str = "mock", mock_interval: float = 2.0):
         self.source = source
         self.mode = mode  # "mock" or "live"
+        self.mock_interval = mock_interval  # seconds between synthetic events
         self.cambrian_client = CambrianHTTPClient() if mode == "live" else None
         print(f"AnalystAgent initialized. Mode: {mode}, Source: {source}")
 
@@ -131,7 +167,14 @@ class AnalystAgent:
                     tx_hash="0x..."
                 )
                 yield event
-                await asyncio.sleep(2)
+                await asyncio.sleep(self.mock_interval)
+
+    async def get_events(self, n: int, timeout: float) -> List[LiquidityEvent]:
+        """
+        Collects up to n liquidity events from the stream.
+        Returns whatever arrived if timeout (seconds) expires first.
+        """
+        return await take(self.stream_liquidity_events(), n, timeout)
 
     async def stream_governance_proposals(self):
         """Simulates streaming governance proposals."""
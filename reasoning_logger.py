@@ -2,24 +2,16 @@
 SenseForge Proof of Reasoning Logger
 Generates audit trails for Verisense compliance and transparency.
 """
+import asyncio
 import json
+import orjson
 from typing import Dict, List, Optional
-from datetime import datetime, date
+from datetime import datetime, timedelta
 from pathlib import Path
 from dataclasses import dataclass, asdict
-from uuid import UUID
 
 from logging_setup import logger
-
-# Custom JSON encoder for datetime objects
-class DateTimeEncoder(json.JSONEncoder):
-    """Handle datetime, date, and UUID serialization for JSON"""
-    def default(self, obj):
-        if isinstance(obj, (datetime, date)):
-            return obj.isoformat()
-        if isinstance(obj, UUID):
-            return str(obj)
-        return super().default(obj)
+from serialization import dumps
 
 @dataclass
 class ReasoningStep:
@@ -77,11 +69,12 @@ class ProofOfReasoningLogger:
         Returns:
             Chain ID
         """
-        chain_id = f"chain_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        now = datetime.now()
+        chain_id = f"chain_{now.strftime('%Y%m%d_%H%M%S_%f')}"
         
         self.current_chain = ReasoningChain(
             chain_id=chain_id,
-            timestamp=datetime.now(),
+            timestamp=now,
             query=query,
             steps=[],
             final_decision={},
@@ -136,27 +129,44 @@ class ProofOfReasoningLogger:
             final_decision: The final output/decision
             total_duration_ms: Total time for the entire chain
         """
+        pending = self._detach_chain(final_decision, total_duration_ms)
+        if pending:
+            self._write_chain(*pending)
+    
+    async def finalize_chain_async(self, final_decision: Dict, total_duration_ms: float):
+        """
+        Like finalize_chain, but writes the file in a worker thread so the
+        event loop isn't blocked on disk I/O.
+        """
+        pending = self._detach_chain(final_decision, total_duration_ms)
+        if pending:
+            await asyncio.to_thread(self._write_chain, *pending)
+    
+    def _detach_chain(self, final_decision: Dict, total_duration_ms: float):
+        """Close out the current chain; returns (filepath, serialized bytes)"""
         if not self.current_chain:
             logger.warning("No active reasoning chain to finalize")
-            return
+            return None
         
-        self.current_chain.final_decision = final_decision
-        self.current_chain.total_duration_ms = total_duration_ms
+        chain = self.current_chain
+        chain.final_decision = final_decision
+        chain.total_duration_ms = total_duration_ms
         
-        # Save to file
-        filename = f"{self.current_chain.chain_id}.json"
-        filepath = self.output_dir / filename
-        
-        with open(filepath, 'w') as f:
-            json.dump(self.current_chain.to_dict(), f, indent=2, cls=DateTimeEncoder)
+        # Clear current chain
+        self.current_chain = None
         
         logger.info(
-            f"[REASONING] Finalized chain {self.current_chain.chain_id} "
-            f"({len(self.current_chain.steps)} steps, {total_duration_ms:.2f}ms)"
+            f"[REASONING] Finalized chain {chain.chain_id} "
+            f"({len(chain.steps)} steps, {total_duration_ms:.2f}ms)"
         )
         
-        # Clear current chain
-        self.current_chain = None
+        data = dumps(chain.to_dict(), option=orjson.OPT_INDENT_2)
+        return self.output_dir / f"{chain.chain_id}.json", data
+    
+    @staticmethod
+    def _write_chain(filepath: Path, data: bytes):
+        with open(filepath, 'wb') as f:
+            f.write(data)
     
     def generate_summary_report(self, lookback_hours: int = 24) -> Dict:
         """
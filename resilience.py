@@ -178,20 +178,30 @@ def with_retry(max_attempts: int = 3, initial_delay: float = 1.0):
 class RateLimiter:
     """Token bucket rate limiter for API calls"""
     
-    def __init__(self, rate: int, per: float):
+    def __init__(
+        self,
+        rate: int,
+        per: float,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Any] = asyncio.sleep
+    ):
         """
         Args:
             rate: Number of requests
             per: Time period in seconds
+            clock: Monotonic time source, in seconds
+            sleep: Coroutine function used to wait for a token
         """
         self.rate = rate
         self.per = per
+        self._clock = clock
+        self._sleep = sleep
         self.allowance = rate
-        self.last_check = time.time()
+        self.last_check = clock()
     
     async def acquire(self):
         """Wait until a token is available"""
-        current = time.time()
+        current = self._clock()
         time_passed = current - self.last_check
         self.last_check = current
         
@@ -202,7 +212,9 @@ class RateLimiter:
         
         if self.allowance < 1.0:
             sleep_time = (1.0 - self.allowance) * (self.per / self.rate)
-            await asyncio.sleep(sleep_time)
+            await self._sleep(sleep_time)
+            # The sleep paid for this token; don't credit it again next call
+            self.last_check = self._clock()
             self.allowance = 0.0
         else:
             self.allowance -= 1.0
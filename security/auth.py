@@ -4,22 +4,31 @@ SenseForge Authentication
 API key-based authentication for enterprise deployments.
 """
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
+from starlette.responses import Response
 from starlette.requests import Request
-from typing import Optional, Set
-import hmac
+from typing import FrozenSet, Optional
+import asyncio
+import contextlib
 import hashlib
 import os
 import json
+import re
+import orjson
 from pathlib import Path
 
+from security.validation import api_key_digest
+
 class APIKeyManager:
     """Manage API keys securely"""
     
     def __init__(self, keys_file: str = ".api_keys.json"):
         self.keys_file = Path(keys_file)
-        self.valid_keys: Set[str] = set()
+        # Keyed digests of valid keys; rebound (never mutated) on reload so
+        # concurrent readers always see a consistent snapshot
+        self.valid_key_hashes: FrozenSet[bytes] = frozenset()
         self.key_metadata: dict = {}
+        self._keys_mtime: Optional[int] = None
+        self._reload_task: Optional[asyncio.Task] = None
         self.load_keys()
     
     def load_keys(self):
@@ -28,34 +37,89 @@ class APIKeyManager:
             return
         
         try:
+            mtime = self.keys_file.stat().st_mtime_ns
             with open(self.keys_file, 'r') as f:
                 data = json.load(f)
-                
-            self.valid_keys = set(data.get('keys', []))
+            
+            self.valid_key_hashes = frozenset(
+                api_key_digest(key) for key in data.get('keys', [])
+            )
             self.key_metadata = data.get('metadata', {})
+            self._keys_mtime = mtime
             
         except Exception as e:
             print(f"Error loading API keys: {e}")
     
+    def reload_if_changed(self) -> bool:
+        """Reload keys if the keys file was modified since the last load"""
+        try:
+            mtime = self.keys_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return False
+        
+        if mtime == self._keys_mtime:
+            return False
+        
+        self.load_keys()
+        return True
+    
+    async def _reload_loop(self, interval: float):
+        """Periodically pick up rotated keys"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if await asyncio.to_thread(self.reload_if_changed):
+                    print("API keys reloaded")
+            except Exception as e:
+                print(f"Error reloading API keys: {e}")
+    
+    def start_reloading(self, interval: float = 30.0):
+        """Poll the keys file in the background so keys can rotate without restart"""
+        if self._reload_task is None:
+            self._reload_task = asyncio.create_task(self._reload_loop(interval))
+    
+    async def stop_reloading(self):
+        """Cancel the background poll and wait for it to finish"""
+        task, self._reload_task = self._reload_task, None
+        if task is not None:
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+    
     def validate_key(self, api_key: str) -> bool:
-        """Validate API key using constant-time comparison"""
-        for valid_key in self.valid_keys:
-            if hmac.compare_digest(api_key, valid_key):
-                return True
-        return False
+        """Validate API key by keyed digest lookup (timing independent of key contents)"""
+        return api_key_digest(api_key) in self.valid_key_hashes
     
     def get_key_metadata(self, api_key: str) -> Optional[dict]:
         """Get metadata for an API key"""
-        # Hash the key to look up metadata
+        # Metadata in the keys file is indexed by a plain SHA-256 prefix
         key_hash = hashlib.sha256(api_key.encode()).hexdigest()[:16]
         return self.key_metadata.get(key_hash)
 
 class AuthenticationMiddleware(BaseHTTPMiddleware):
     """API key authentication middleware"""
     
-    def __init__(self, app):
+    # Reject bodies are static, so serialize them once
+    _AUTH_MISSING_BODY = orjson.dumps({
+        "status": "error",
+        "error_type": "authentication_required",
+        "message": "API key is required. Include X-API-Key header."
+    })
+    _INVALID_KEY_BODY = orjson.dumps({
+        "status": "error",
+        "error_type": "invalid_api_key",
+        "message": "Invalid API key"
+    })
+    
+    def __init__(self, app, key_manager: Optional[APIKeyManager] = None):
+        """
+        Args:
+            app: Downstream ASGI app
+            key_manager: Shared key manager; the app starts and stops its
+                background reload (see APIKeyManager.start_reloading)
+        """
         super().__init__(app)
-        self.key_manager = APIKeyManager()
+        self.key_manager = key_manager or APIKeyManager()
         
         # Public endpoints that don't require authentication
         self.public_endpoints = {
@@ -63,36 +127,41 @@ class AuthenticationMiddleware(BaseHTTPMiddleware):
             '/health',
             '/metrics'
         }
+        self._public_re = re.compile(
+            b'(?:'
+            + b'|'.join(re.escape(path.encode()) for path in self.public_endpoints)
+            + rb')(?:\?|\Z)'
+        )
+    
+    async def __call__(self, scope, receive, send):
+        """Pass public endpoints straight through without building a Request"""
+        if scope['type'] == 'http':
+            raw_path = scope.get('raw_path') or scope['path'].encode()
+            if self._public_re.match(raw_path):
+                await self.app(scope, receive, send)
+                return
+        
+        await super().__call__(scope, receive, send)
     
     async def dispatch(self, request: Request, call_next):
         """Authenticate request"""
         
-        # Skip authentication for public endpoints
-        if request.url.path in self.public_endpoints:
-            return await call_next(request)
-        
         # Extract API key from header
         api_key = request.headers.get('X-API-Key')
         
         if not api_key:
-            return JSONResponse(
-                {
-                    "status": "error",
-                    "error_type": "authentication_required",
-                    "message": "API key is required. Include X-API-Key header."
-                },
-                status_code=401
+            return Response(
+                self._AUTH_MISSING_BODY,
+                status_code=401,
+                media_type='application/json'
             )
         
         # Validate API key
         if not self.key_manager.validate_key(api_key):
-            return JSONResponse(
-                {
-                    "status": "error",
-                    "error_type": "invalid_api_key",
-                    "message": "Invalid API key"
-                },
-                status_code=403
+            return Response(
+                self._INVALID_KEY_BODY,
+                status_code=403,
+                media_type='application/json'
             )
         
         # Add key metadata to request state
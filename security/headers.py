@@ -0,0 +1,45 @@
+"""
+SenseForge Security Headers
+Static hardening headers applied to every HTTP response.
+"""
+from security.validation import get_csp_header
+
+# Built once at import; none of these vary per request
+SECURITY_HEADERS = {
+    'X-Content-Type-Options': 'nosniff',
+    'X-Frame-Options': 'DENY',
+    'X-XSS-Protection': '1; mode=block',
+    'Content-Security-Policy': get_csp_header(),
+    'Strict-Transport-Security': 'max-age=31536000; includeSubDomains',
+}
+
+# Raw ASGI header pairs, lowercased as the ASGI spec requires
+_RAW_SECURITY_HEADERS = [
+    (name.lower().encode('latin-1'), value.encode('latin-1'))
+    for name, value in SECURITY_HEADERS.items()
+]
+_SECURITY_HEADER_NAMES = frozenset(name for name, _ in _RAW_SECURITY_HEADERS)
+
+class SecurityHeadersMiddleware:
+    """Pure ASGI middleware that appends SECURITY_HEADERS to every response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message['type'] == 'http.response.start':
+                # Drop any copies set by the handler so each header appears once
+                headers = [
+                    (name, value) for name, value in message.get('headers', ())
+                    if name.lower() not in _SECURITY_HEADER_NAMES
+                ]
+                headers.extend(_RAW_SECURITY_HEADERS)
+                message['headers'] = headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
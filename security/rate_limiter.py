@@ -3,16 +3,171 @@
 SenseForge Rate Limiting
 Enterprise-grade rate limiting with multiple strategies.
 """
+import math
 import time
-import asyncio
+from functools import lru_cache
 from typing import Dict, Optional
-from datetime import datetime, timedelta
-from collections import defaultdict
 from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
+from starlette.responses import Response
 from starlette.requests import Request
 import redis.asyncio as redis
+import orjson
 import os
+import re
+import struct
+import tempfile
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Shared Redis connection pools, one per URL, reused by every RateLimiter
+_REDIS_POOLS: Dict[str, redis.ConnectionPool] = {}
+
+def _get_redis_pool(redis_url: str) -> redis.ConnectionPool:
+    """Get (or lazily create) the shared connection pool for a Redis URL"""
+    pool = _REDIS_POOLS.get(redis_url)
+    if pool is None:
+        pool = redis.ConnectionPool.from_url(
+            redis_url,
+            max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', 64)),
+            decode_responses=False,  # replies are numeric; skip str decoding
+            # redis-py already sets TCP_NODELAY on every connection
+            socket_connect_timeout=0.5,
+            socket_timeout=1.0,
+            socket_keepalive=True
+        )
+        _REDIS_POOLS[redis_url] = pool
+    return pool
+
+# KEYS[1] = bucket hash; ARGV = now (s), capacity, refill per second, ttl (ms).
+# Returns {allowed, tokens left}; tokens as a string since Lua numbers
+# are truncated to integers on the way back.
+_TOKEN_BUCKET_LUA = """
+local now = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local last = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * tonumber(ARGV[3]))
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], ARGV[4])
+return {allowed, tostring(tokens)}
+"""
+
+# Repeat clients reuse the same key strings instead of rebuilding them per request
+@lru_cache(maxsize=4096)
+def _redis_key(client_key: str) -> bytes:
+    """Redis key for a client's rate limit bucket"""
+    return f"ratelimit:{client_key}".encode()
+
+@lru_cache(maxsize=4096)
+def _client_key(prefix: str, value: str) -> str:
+    """Client identifier used as the rate limit bucket key"""
+    return f"{prefix}:{value}"
+
+@lru_cache(maxsize=4096)
+def _api_key_client_key(api_key: str) -> str:
+    """Client identifier for an API key (only the prefix is kept)"""
+    return f"apikey:{api_key[:16]}"
+
+class SharedMemoryStore:
+    """
+    Fixed-size token bucket table in POSIX shared memory.
+    
+    Every worker process on a host attaches to the same named segment, so
+    the limit is enforced globally instead of once per worker. Keys are
+    mapped to slots with a stable hash; colliding keys share a bucket.
+    """
+    
+    # One slot: (tokens, last_check)
+    SLOT = struct.Struct('dd')
+    
+    def __init__(self, name: str = 'senseforge_ratelimit', slots: int = 65536):
+        """
+        Args:
+            name: Shared memory segment name (shared by all workers)
+            slots: Number of bucket slots
+        """
+        if fcntl is None:
+            raise RuntimeError("Shared memory rate limiting requires a POSIX platform")
+        
+        self.name = name
+        self.slots = slots
+        size = slots * self.SLOT.size
+        
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self.shm = shared_memory.SharedMemory(name=name)
+        
+        # The segment outlives any single worker; don't let the resource
+        # tracker unlink it when this process exits
+        resource_tracker.unregister(self.shm._name, 'shared_memory')
+        
+        # Byte-range locks on this file guard individual slots across processes
+        lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self._lock_file = open(lock_path, 'a+b')
+    
+    def _slot(self, key: str) -> int:
+        return zlib.crc32(key.encode()) % self.slots
+    
+    def consume(self, key: str, rate: int, refill_per_sec: float, current: float) -> tuple[bool, float]:
+        """
+        Refill and try to take one token from the key's bucket.
+        
+        Args:
+            key: Client key
+            rate: Bucket capacity
+            refill_per_sec: Tokens added per second
+            current: Current time
+        
+        Returns:
+            (allowed: bool, tokens left in the bucket)
+        """
+        slot = self._slot(key)
+        offset = slot * self.SLOT.size
+        fd = self._lock_file.fileno()
+        
+        fcntl.lockf(fd, fcntl.LOCK_EX, 1, slot)
+        try:
+            tokens, last_check = self.SLOT.unpack_from(self.shm.buf, offset)
+            
+            # Zeroed slot: first request for this bucket
+            if last_check == 0.0:
+                tokens = float(rate)
+                last_check = current
+            
+            # Another worker may have stored a slightly newer time; never refill
+            # by a negative interval (same clamp as the Redis script)
+            tokens = min(float(rate), tokens + max(0.0, current - last_check) * refill_per_sec)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            
+            self.SLOT.pack_into(self.shm.buf, offset, tokens, current)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, slot)
+        
+        return allowed, tokens
+    
+    def close(self, unlink: bool = False):
+        """Detach from the segment, optionally destroying it"""
+        self._lock_file.close()
+        self.shm.close()
+        if unlink:
+            # unlink() unregisters from the tracker, so hand it back first
+            resource_tracker.register(self.shm._name, 'shared_memory')
+            self.shm.unlink()
+            os.unlink(self._lock_file.name)
 
 class RateLimiter:
     """
@@ -24,26 +179,41 @@ class RateLimiter:
         rate: int = 100,
         per: float = 60,
         storage: str = 'memory',
-        redis_url: Optional[str] = None
+        redis_url: Optional[str] = None,
+        redis_client: Optional[redis.Redis] = None
     ):
         """
         Args:
             rate: Number of allowed requests
             per: Time period in seconds
-            storage: 'memory' or 'redis'
+            storage: 'memory', 'shm' (shared across local workers) or 'redis'
             redis_url: Redis connection URL for distributed rate limiting
+            redis_client: Existing async Redis client (overrides redis_url)
         """
         self.rate = rate
         self.per = per
         self.storage = storage
         
+        # Hoisted out of the per-request token math
+        self._refill_per_sec = rate / per
+        self._retry_scale = per / rate
+        
         if storage == 'redis':
-            redis_url = redis_url or os.getenv('REDIS_URL', 'redis://localhost:6379')
-            self.redis_client = redis.from_url(redis_url, decode_responses=True)
+            if redis_client is None:
+                redis_url = redis_url or os.getenv('REDIS_URL', 'redis://localhost:6379')
+                redis_client = redis.Redis(connection_pool=_get_redis_pool(redis_url))
+            self.redis_client = redis_client
+            # Sent with EVALSHA; redis-py loads the script on NOSCRIPT
+            self._token_bucket = self.redis_client.register_script(_TOKEN_BUCKET_LUA)
+            # An idle bucket is full again after 'per' seconds; drop it then
+            self._bucket_ttl_ms = math.ceil(per * 1000) + 1000
+        elif storage == 'shm':
+            self.shm_store = SharedMemoryStore(
+                name=os.getenv('RATE_LIMIT_SHM_NAME', 'senseforge_ratelimit')
+            )
         else:
-            # In-memory storage
-            self.allowances: Dict[str, float] = {}
-            self.last_check: Dict[str, float] = {}
+            # In-memory storage: key -> (tokens, last refill on the monotonic clock)
+            self.buckets: Dict[str, tuple[float, float]] = {}
     
     async def is_allowed(self, key: str) -> tuple[bool, Dict]:
         """
@@ -54,33 +224,53 @@ class RateLimiter:
         """
         if self.storage == 'redis':
             return await self._check_redis(key)
+        elif self.storage == 'shm':
+            return await self._check_shm(key)
         else:
             return await self._check_memory(key)
     
     async def _check_memory(self, key: str) -> tuple[bool, Dict]:
         """Memory-based rate limiting"""
-        current = time.time()
-        
-        if key not in self.last_check:
-            self.last_check[key] = current
-            self.allowances[key] = self.rate
+        # No lock: nothing below awaits, so the read-refill-write of a bucket
+        # runs to completion on the event loop without interleaving
+        # Monotonic for the refill math; wall clock only for the reset header
+        now = time.monotonic()
+        tokens, last = self.buckets.get(key, (self.rate, now))
         
-        time_passed = current - self.last_check[key]
-        self.last_check[key] = current
+        # Refill lazily since the last hit, capped at capacity
+        tokens = min(self.rate, tokens + (now - last) * self._refill_per_sec)
+        current = time.time()
         
-        # Refill tokens
-        self.allowances[key] += time_passed * (self.rate / self.per)
-        if self.allowances[key] > self.rate:
-            self.allowances[key] = self.rate
+        if tokens >= 1.0:
+            tokens -= 1.0
+            self.buckets[key] = (tokens, now)
+            return True, {
+                'remaining': int(tokens),
+                'reset': int(current + self.per)
+            }
+        else:
+            self.buckets[key] = (tokens, now)
+            retry_after = int((1.0 - tokens) * self._retry_scale)
+            return False, {
+                'remaining': 0,
+                'reset': int(current + self.per),
+                'retry_after': retry_after
+            }
+    
+    async def _check_shm(self, key: str) -> tuple[bool, Dict]:
+        """Shared-memory rate limiting (global across workers on one host)"""
+        current = time.time()
+        allowed, tokens = self.shm_store.consume(
+            key, self.rate, self._refill_per_sec, current
+        )
         
-        if self.allowances[key] >= 1.0:
-            self.allowances[key] -= 1.0
+        if allowed:
             return True, {
-                'remaining': int(self.allowances[key]),
+                'remaining': int(tokens),
                 'reset': int(current + self.per)
             }
         else:
-            retry_after = int((1.0 - self.allowances[key]) * (self.per / self.rate))
+            retry_after = int((1.0 - tokens) * self._retry_scale)
             return False, {
                 'remaining': 0,
                 'reset': int(current + self.per),
@@ -89,32 +279,21 @@ class RateLimiter:
     
     async def _check_redis(self, key: str) -> tuple[bool, Dict]:
         """Redis-based distributed rate limiting"""
-        redis_key = f"ratelimit:{key}"
-        
-        # Use Redis sorted set for sliding window
+        # Token bucket refilled and consumed atomically in Lua: one round trip
         current = time.time()
-        window_start = current - self.per
-        
-        # Remove old entries
-        await self.redis_client.zremrangebyscore(redis_key, 0, window_start)
-        
-        # Count requests in window
-        count = await self.redis_client.zcard(redis_key)
+        result = await self._token_bucket(
+            keys=[_redis_key(key)],
+            args=[current, self.rate, self._refill_per_sec, self._bucket_ttl_ms]
+        )
+        tokens = float(result[1])
         
-        if count < self.rate:
-            # Add new request
-            await self.redis_client.zadd(redis_key, {str(current): current})
-            await self.redis_client.expire(redis_key, int(self.per) + 1)
-            
+        if int(result[0]):
             return True, {
-                'remaining': self.rate - count - 1,
+                'remaining': int(tokens),
                 'reset': int(current + self.per)
             }
         else:
-            # Get oldest request time to calculate retry_after
-            oldest = await self.redis_client.zrange(redis_key, 0, 0, withscores=True)
-            retry_after = int(oldest[0][1] + self.per - current) if oldest else int(self.per)
-            
+            retry_after = int((1.0 - tokens) * self._retry_scale)
             return False, {
                 'remaining': 0,
                 'reset': int(current + self.per),
@@ -124,10 +303,24 @@ class RateLimiter:
 class RateLimitMiddleware(BaseHTTPMiddleware):
     """Starlette middleware for rate limiting"""
     
+    # Paths exempt from rate limiting, matched against the raw ASGI path
+    # (some servers leave the query string on raw_path)
+    _SKIP_PATHS_RE = re.compile(rb'(?:/health|/metrics|/\.well-known/agent\.json)(?:\?|\Z)')
+    
     def __init__(self, app, rate_limiter: RateLimiter):
         super().__init__(app)
         self.rate_limiter = rate_limiter
     
+    async def __call__(self, scope, receive, send):
+        """Pass exempt paths straight through without building a Request"""
+        if scope['type'] == 'http':
+            raw_path = scope.get('raw_path') or scope['path'].encode()
+            if self._SKIP_PATHS_RE.match(raw_path):
+                await self.app(scope, receive, send)
+                return
+        
+        await super().__call__(scope, receive, send)
+    
     def get_client_key(self, request: Request) -> str:
         """Extract client identifier from request"""
         # Priority order: API key > Client ID > IP address
@@ -135,14 +328,14 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         # Check for API key
         api_key = request.headers.get('X-API-Key')
         if api_key:
-            return f"apikey:{api_key[:16]}"
+            return _api_key_client_key(api_key)
         
         # Check for client ID in body (for POST requests)
         if request.method == 'POST':
             # This would require caching the body, so use header instead
             client_id = request.headers.get('X-Client-ID')
             if client_id:
-                return f"client:{client_id}"
+                return _client_key('client', client_id)
         
         # Fallback to IP address
         forwarded_for = request.headers.get('X-Forwarded-For')
@@ -151,29 +344,25 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         else:
             ip = request.client.host if request.client else 'unknown'
         
-        return f"ip:{ip}"
+        return _client_key('ip', ip)
     
     async def dispatch(self, request: Request, call_next):
         """Apply rate limiting to request"""
-        
-        # Skip rate limiting for health check
-        if request.url.path in ['/health', '/metrics', '/.well-known/agent.json']:
-            return await call_next(request)
-        
         client_key = self.get_client_key(request)
         allowed, info = await self.rate_limiter.is_allowed(client_key)
         
         if not allowed:
-            return JSONResponse(
-                {
+            return Response(
+                orjson.dumps({
                     "status": "error",
                     "error_type": "rate_limit_exceeded",
                     "message": "Rate limit exceeded. Please retry after the specified time.",
                     "retry_after": info.get('retry_after', 60),
                     "limit": self.rate_limiter.rate,
                     "period": self.rate_limiter.per
-                },
+                }),
                 status_code=429,
+                media_type='application/json',
                 headers={
                     'X-RateLimit-Limit': str(self.rate_limiter.rate),
                     'X-RateLimit-Remaining': '0',
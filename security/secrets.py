@@ -3,6 +3,7 @@ SenseForge Secrets Management - PRODUCTION READY
 Secure handling of API keys and sensitive configuration
 """
 import os
+import re
 import json
 import base64
 from pathlib import Path
@@ -209,6 +210,9 @@ class SecretsManager:
 class ConfigValidator:
     """Validate and sanitize configuration values"""
     
+    # Obviously fake keys, matched in a single case-insensitive pass
+    _FAKE_KEY_RE = re.compile(r'test|demo|example|changeme|123456', re.IGNORECASE)
+    
     @staticmethod
     def validate_api_key(key: str) -> bool:
         """Validate API key format"""
@@ -220,12 +224,10 @@ class ConfigValidator:
             return False
         
         # Check for obviously fake keys
-        fake_patterns = ['test', 'demo', 'example', 'changeme', '123456']
-        key_lower = key.lower()
-        for pattern in fake_patterns:
-            if pattern in key_lower:
-                logger.warning(f"API key contains suspicious pattern: {pattern}")
-                return False
+        match = ConfigValidator._FAKE_KEY_RE.search(key)
+        if match:
+            logger.warning(f"API key contains suspicious pattern: {match.group(0).lower()}")
+            return False
         
         return True
     
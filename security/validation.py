@@ -2,16 +2,38 @@
 SenseForge Input Validation & Sanitization - SECURITY HARDENED
 Implements comprehensive XSS, SQL injection, and injection attack prevention
 """
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 from typing import Optional, Dict, Any
+from functools import lru_cache
+from collections import deque
+import os
 import re
+import hmac
+import hashlib
 import html
 import unicodedata
-from datetime import datetime
 import logging
+import threading
+
+import orjson
+
+from serialization import dumps, utc_now_iso
+
+try:
+    import bleach
+except ImportError:
+    bleach = None
+
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
 
 logger = logging.getLogger(__name__)
 
+if bleach is None:
+    logger.warning("bleach not installed, using fallback HTML sanitization")
+
 # ===== SANITIZATION ENGINE =====
 class SecuritySanitizer:
     """
@@ -31,6 +53,12 @@ class SecuritySanitizer:
         r'(\.\./|\.\.\\)',
     ]
     
+    # Metadata keys that may carry credentials (matched as substrings)
+    FORBIDDEN_METADATA_KEYS = [
+        'password', 'secret', 'api_key', 'token', 'credential',
+        'private_key', 'passphrase'
+    ]
+    
     # JavaScript event handlers to strip
     JS_EVENTS = [
         'onload', 'onerror', 'onclick', 'onmouseover', 'onmouseout',
@@ -60,33 +88,39 @@ class SecuritySanitizer:
         if len(text) > max_length:
             raise ValueError(f"Input exceeds maximum length of {max_length}")
         
-        # Unicode normalization (prevents homograph attacks)
-        text = unicodedata.normalize('NFKC', text)
+        # Unicode normalization (prevents homograph attacks); a no-op for ASCII
+        if not text.isascii():
+            text = unicodedata.normalize('NFKC', text)
         
-        # Check for forbidden patterns
-        for pattern in cls.FORBIDDEN_PATTERNS:
-            if re.search(pattern, text, re.IGNORECASE):
-                raise ValueError(
-                    f"Input contains forbidden pattern. Query rejected for security."
-                )
-        
-        # Remove null bytes
-        text = text.replace('\x00', '')
+        # Check for forbidden patterns (single multi-pattern scan)
+        if _contains_forbidden(text):
+            raise ValueError(
+                f"Input contains forbidden pattern. Query rejected for security."
+            )
         
-        # HTML escape (basic XSS prevention)
+        return cls._scrub(text)
+    
+    @classmethod
+    def _scrub(cls, text: str) -> str:
+        """Strip control characters, escape HTML and remove script vectors"""
+        # Remove null bytes and other C0 control characters (keeps \t, \n, \r).
+        # Control characters are never printable, so the C-level isprintable()
+        # scan lets clean text skip the much slower per-character translate
+        if not text.isprintable():
+            text = text.translate(_CONTROL_CHAR_TABLE)
+        
+        # HTML escape (basic XSS prevention). html.escape's chained
+        # str.replace calls beat a multi-character str.translate table
         text = html.escape(text, quote=True)
         
-        # Strip JavaScript event handlers
-        for event in cls.JS_EVENTS:
-            # Case-insensitive replacement
-            pattern = re.compile(re.escape(event), re.IGNORECASE)
-            text = pattern.sub('', text)
+        # Strip JavaScript event handlers (case-insensitive, single pass)
+        text = _JS_EVENT_UNION.sub('', text)
         
         # Remove data URIs (can contain JavaScript)
-        text = re.sub(r'data:[^,]*,', '', text, flags=re.IGNORECASE)
+        text = _strip_terminated(_DATA_URI_RE, text, ',')
         
         # Remove javascript: protocol
-        text = re.sub(r'javascript:', '', text, flags=re.IGNORECASE)
+        text = _JS_PROTOCOL_RE.sub('', text)
         
         return text
     
@@ -101,24 +135,18 @@ class SecuritySanitizer:
         Returns:
             Sanitized HTML with no tags
         """
-        try:
-            import bleach
-            
+        if bleach is not None:
             # Strip ALL HTML tags
-            clean = bleach.clean(
+            return bleach.clean(
                 html_text,
                 tags=[],  # No tags allowed
                 attributes={},
                 strip=True,
                 strip_comments=True
             )
-            
-            return clean
         
-        except ImportError:
-            logger.warning("bleach not installed, using fallback sanitization")
-            # Fallback: strip all tags manually
-            return re.sub(r'<[^>]+>', '', html_text)
+        # Fallback: strip all tags manually
+        return _strip_terminated(_HTML_TAG_RE, html_text, '>')
     
     @classmethod
     def validate_proposal_id(cls, proposal_id: str) -> bool:
@@ -132,8 +160,7 @@ class SecuritySanitizer:
             True if valid format
         """
         # Format: PROP-<number>
-        pattern = r'^PROP-\d{1,6}$'
-        return bool(re.match(pattern, proposal_id))
+        return _PROP_ID_RE.match(proposal_id) is not None
     
     @classmethod
     def sanitize_metadata(cls, metadata: Dict) -> Dict:
@@ -152,61 +179,251 @@ class SecuritySanitizer:
         if not metadata:
             return {}
         
-        # Size check (prevent memory attacks)
-        import sys
-        size = sys.getsizeof(metadata)
-        if size > 10 * 1024:  # 10KB limit
+        # Walk nested dicts breadth-first, collecting string leaves as
+        # (container, slot, text) so the forbidden scan runs once overall
+        sanitized = {}
+        leaves = []
+        pending = deque([(metadata, sanitized)])
+        while pending:
+            source, target = pending.popleft()
+            
+            # Forbidden keys (prevent credential leaks)
+            for key in source.keys():
+                if _is_forbidden_key(key):
+                    raise ValueError(
+                        f"Metadata cannot contain key: {key}"
+                    )
+            
+            for key, value in source.items():
+                if isinstance(value, str):
+                    target[key] = value
+                    leaves.append((target, key, value))
+                elif isinstance(value, (int, float, bool)):
+                    target[key] = value
+                elif isinstance(value, dict):
+                    target[key] = {}
+                    pending.append((value, target[key]))
+                elif isinstance(value, list):
+                    items = value[:100]  # Limit list size
+                    target[key] = items
+                    for i, v in enumerate(items):
+                        if isinstance(v, str):
+                            leaves.append((items, i, v))
+                else:
+                    # Skip unsupported types
+                    logger.warning(f"Skipping metadata key {key} with unsupported type")
+        
+        for _, _, text in leaves:
+            if len(text) > 1000:
+                raise ValueError("Input exceeds maximum length of 1000")
+        
+        # Size check on the serialized payload (prevent memory attacks);
+        # after the per-value check, so one long value still reports that
+        try:
+            raw = orjson.dumps(metadata)
+        except TypeError:
+            raise ValueError("Metadata contains unsupported values")
+        if len(raw) > 10 * 1024:  # 10KB limit
             raise ValueError("Metadata size exceeds limit (10KB)")
         
-        # Forbidden keys (prevent credential leaks)
-        forbidden_keys = {
-            'password', 'secret', 'api_key', 'token', 'credential',
-            'private_key', 'passphrase'
-        }
+        if not leaves:
+            return sanitized
         
-        for key in metadata.keys():
-            if any(forbidden in key.lower() for forbidden in forbidden_keys):
-                raise ValueError(
-                    f"Metadata cannot contain key: {key}"
-                )
+        texts = [
+            text if text.isascii() else unicodedata.normalize('NFKC', text)
+            for _, _, text in leaves
+        ]
         
-        # Sanitize all string values
-        sanitized = {}
-        for key, value in metadata.items():
-            if isinstance(value, str):
-                sanitized[key] = cls.sanitize_text(value, max_length=1000)
-            elif isinstance(value, (int, float, bool)):
-                sanitized[key] = value
-            elif isinstance(value, dict):
-                sanitized[key] = cls.sanitize_metadata(value)
-            elif isinstance(value, list):
-                sanitized[key] = [
-                    cls.sanitize_text(str(v), max_length=1000) 
-                    if isinstance(v, str) else v
-                    for v in value[:100]  # Limit list size
-                ]
-            else:
-                # Skip unsupported types
-                logger.warning(f"Skipping metadata key {key} with unsupported type")
+        # '\x01' is a non-word character no pattern matches, so joining
+        # neither creates nor hides a match across leaf boundaries
+        if _contains_forbidden('\x01'.join(texts)):
+            raise ValueError(
+                f"Input contains forbidden pattern. Query rejected for security."
+            )
+        
+        for (container, slot, _), text in zip(leaves, texts):
+            container[slot] = cls._scrub(text) if text else ""
         
         return sanitized
 
+# Regex metacharacters; any other character, or one of these escaped, is literal
+_REGEX_META = frozenset('.^$*+?{}[]|()\\')
+
+def _lower_regex(tokens: list) -> str:
+    """Join regex tokens, lowercasing all but escapes (\\b and \\B differ)"""
+    return ''.join(t if t[0] == '\\' else t.lower() for t in tokens)
+
+def _split_forbidden_patterns(patterns) -> tuple[tuple, str]:
+    """
+    Split forbidden patterns into plain literals and a lowercased regex
+    
+    Each alternative of a plain '(a|b|...)' group that is made only of
+    ordinary characters and escaped punctuation becomes a lowercase literal
+    for a substring check. Everything else (\\b, classes, quantifiers) is
+    joined into one regex that runs case-sensitively against lowered text.
+    
+    Returns:
+        (literals, regex source; empty if every alternative is literal)
+    """
+    literals, regexes = [], []
+    for pattern in patterns:
+        tokens = re.findall(r'\\.|.', pattern, re.DOTALL)
+        inner = tokens[1:-1]
+        if not (
+            tokens[:1] == ['('] and tokens[-1:] == [')']
+            and inner[:1] != ['?'] and '(' not in inner and ')' not in inner
+        ):
+            # Not a single flat capturing group; keep the pattern whole
+            regexes.append('(' + _lower_regex(tokens) + ')')
+            continue
+        
+        alternative = []
+        for token in inner + ['|']:
+            if token != '|':
+                alternative.append(token)
+            elif all(
+                t not in _REGEX_META if len(t) == 1 else not t[1].isalnum()
+                for t in alternative
+            ):
+                literals.append(''.join(t[-1] for t in alternative).lower())
+                alternative = []
+            else:
+                regexes.append(_lower_regex(alternative))
+                alternative = []
+    return tuple(literals), '|'.join(regexes)
+
+# Sanitizer patterns are compiled once at import; sanitize_text runs on every request
+# The re fallback derives both checks from FORBIDDEN_PATTERNS, the same
+# source the Hyperscan database is compiled from: literals are checked with
+# str.__contains__ on the lowercased text, and the rest (the SQL keywords,
+# which need \b) is matched case-sensitively against that lowered text,
+# which sre scans about twice as fast as an IGNORECASE search of the
+# original. ASCII \b, as in Hyperscan
+_FORBIDDEN_LITERALS, _forbidden_regex = _split_forbidden_patterns(
+    SecuritySanitizer.FORBIDDEN_PATTERNS
+)
+_FORBIDDEN_REGEX_RE = re.compile(_forbidden_regex, re.ASCII) if _forbidden_regex else None
+# Non-ASCII letters that an IGNORECASE search equates with ASCII ones.
+# Neither str.lower() nor Hyperscan's ASCII-only CASELESS folds U+0131,
+# and lower() turns U+0130 into 'i' plus a combining dot, so both scan
+# backends fold them (and the two NFKC would catch) to ASCII first
+_ASCII_CASE_FOLD = str.maketrans({
+    '\u0130': 'i', '\u0131': 'i', '\u017f': 's', '\u212a': 'k',
+})
+_JS_EVENT_UNION = re.compile(
+    '|'.join(map(re.escape, SecuritySanitizer.JS_EVENTS)),
+    re.IGNORECASE
+)
+_FORBIDDEN_KEY_RE = re.compile(
+    '|'.join(re.escape(key) for key in SecuritySanitizer.FORBIDDEN_METADATA_KEYS)
+)
+_CONTROL_CHAR_TABLE = str.maketrans(
+    '', '', ''.join(chr(c) for c in range(0x20) if chr(c) not in '\t\n\r')
+)
+_DATA_URI_RE = re.compile(r'data:[^,]*,', re.IGNORECASE)
+_JS_PROTOCOL_RE = re.compile(r'javascript:', re.IGNORECASE)
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+# \Z, unlike $, does not accept a trailing newline
+_PROP_ID_RE = re.compile(r'\APROP-\d{1,6}\Z')
+
+# Metadata schemas repeat across requests, so most keys are cache hits
+@lru_cache(maxsize=4096)
+def _is_forbidden_key(key: str) -> bool:
+    """Whether a metadata key contains any forbidden key as a substring"""
+    return _FORBIDDEN_KEY_RE.search(key.lower()) is not None
+
+def _strip_terminated(pattern: re.Pattern, text: str, terminator: str) -> str:
+    """
+    pattern.sub('', text) for patterns of the form 'prefix[^t]*t'
+    
+    Such patterns are quadratic on input with many prefixes and no
+    terminator ('<<<<...'), since every start scans to the end of the
+    string. Nothing after the last terminator can match, so only the text
+    up to it is searched, where every start stops at the next terminator.
+    """
+    end = text.rfind(terminator) + 1
+    if not end:
+        return text
+    return pattern.sub('', text[:end]) + text[end:]
+
+
+def _compile_forbidden_db():
+    """Compile FORBIDDEN_PATTERNS into a Hyperscan database, if available"""
+    if hyperscan is None:
+        return None
+    patterns = SecuritySanitizer.FORBIDDEN_PATTERNS
+    # \b is ASCII-only here (UCP mode rejects it), so a keyword glued to a
+    # non-ASCII letter is rejected; the re fallback uses ASCII \b to match
+    flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_SINGLEMATCH
+    try:
+        db = hyperscan.Database(mode=hyperscan.HS_MODE_BLOCK)
+        db.compile(
+            expressions=[p.encode() for p in patterns],
+            ids=list(range(len(patterns))),
+            flags=[flags] * len(patterns)
+        )
+        return db
+    except hyperscan.error as e:
+        logger.warning(f"Hyperscan compile failed, using fallback forbidden-pattern scan: {e}")
+        return None
+
+_FORBIDDEN_DB = _compile_forbidden_db()
+_FORBIDDEN_SCRATCH = hyperscan.Scratch(_FORBIDDEN_DB) if _FORBIDDEN_DB else None
+# Scratch space can't be shared by concurrent scans; clone one per thread
+_scan_local = threading.local()
+
+def _stop_scan(*_args):
+    return True
+
+def _contains_forbidden(text: str) -> bool:
+    """Return True if text matches any of SecuritySanitizer.FORBIDDEN_PATTERNS"""
+    if not text.isascii():
+        text = text.translate(_ASCII_CASE_FOLD)
+    
+    if _FORBIDDEN_DB is None:
+        lowered = text.lower()
+        if any(literal in lowered for literal in _FORBIDDEN_LITERALS):
+            return True
+        return (
+            _FORBIDDEN_REGEX_RE is not None
+            and _FORBIDDEN_REGEX_RE.search(lowered) is not None
+        )
+    
+    scratch = getattr(_scan_local, 'scratch', None)
+    if scratch is None:
+        scratch = _scan_local.scratch = _FORBIDDEN_SCRATCH.clone()
+    try:
+        _FORBIDDEN_DB.scan(
+            text.encode('utf-8', 'surrogatepass'),
+            match_event_handler=_stop_scan,
+            scratch=scratch
+        )
+    except hyperscan.ScanTerminated:
+        # The handler stops the scan on the first match
+        return True
+    return False
+
 # ===== REQUEST MODELS =====
 class QueryRequest(BaseModel):
     """
     Validated and sanitized query request
     """
+    # Prevent extra fields; frozen since a validated request is never edited
+    model_config = ConfigDict(extra='forbid', frozen=True)
+    
     query: str = Field(..., min_length=1, max_length=5000)
     proposal_id: Optional[str] = None
     context: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
     
-    @validator('query')
+    @field_validator('query', mode='after')
+    @classmethod
     def sanitize_query(cls, v):
         """Sanitize query text"""
         return SecuritySanitizer.sanitize_text(v, max_length=5000)
     
-    @validator('proposal_id')
+    @field_validator('proposal_id', mode='after')
+    @classmethod
     def validate_proposal(cls, v):
         """Validate proposal ID format"""
         if v is None:
@@ -219,23 +436,21 @@ class QueryRequest(BaseModel):
         
         return v
     
-    @validator('context')
+    @field_validator('context', mode='after')
+    @classmethod
     def sanitize_context(cls, v):
         """Sanitize context"""
         if v is None:
             return v
         return SecuritySanitizer.sanitize_text(v, max_length=2000)
     
-    @validator('metadata')
+    @field_validator('metadata', mode='after')
+    @classmethod
     def sanitize_metadata(cls, v):
         """Sanitize metadata"""
         if v is None:
             return {}
         return SecuritySanitizer.sanitize_metadata(v)
-    
-    class Config:
-        # Prevent extra fields
-        extra = 'forbid'
 
 # ===== RESPONSE BUILDER =====
 class SecureResponseBuilder:
@@ -260,25 +475,12 @@ class SecureResponseBuilder:
         Returns:
             Response dictionary
         """
-        import json
-        from datetime import datetime as dt, date
-        from uuid import UUID
-        
-        def datetime_handler(obj):
-            if isinstance(obj, (dt, date)):
-                return obj.isoformat()
-            if isinstance(obj, UUID):
-                return str(obj)
-            raise TypeError(f"Object of type {type(obj)} is not JSON serializable")
-        
-        # Convert any datetime objects to ISO format strings
-        serializable_data = json.loads(json.dumps(data, default=datetime_handler))
-        
+        # Datetimes, UUIDs and tuples are left as-is: dumps() encodes them
         response = {
             'status': 'success',
             'request_id': request_id,
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
-            'data': serializable_data
+            'timestamp': utc_now_iso(),
+            'data': data
         }
         
         if include_debug:
@@ -289,6 +491,11 @@ class SecureResponseBuilder:
         
         return response
     
+    @staticmethod
+    def dumps(obj: Any, option: int = 0) -> bytes:
+        """Serialize a response to JSON bytes (see serialization.dumps)"""
+        return dumps(obj, option)
+    
     @staticmethod
     def error_response(
         error_type: str,
@@ -329,7 +536,7 @@ class SecureResponseBuilder:
             'error_type': error_type,
             'message': message,
             'request_id': request_id,
-            'timestamp': datetime.utcnow().isoformat() + 'Z'
+            'timestamp': utc_now_iso()
         }
         
         if details and expose_details:
@@ -338,9 +545,26 @@ class SecureResponseBuilder:
         return response
 
 # ===== API KEY VALIDATOR =====
+# Per-process secret: candidate keys are only ever fed through HMAC, so
+# the set lookup below leaks nothing useful about valid keys
+_KEY_HMAC_SECRET = os.urandom(32)
+
+def api_key_digest(key: str) -> bytes:
+    """Keyed digest of an API key, for lookups against stored digests"""
+    return hmac.new(_KEY_HMAC_SECRET, key.encode('utf-8'), hashlib.sha256).digest()
+
+@lru_cache(maxsize=16)
+def _valid_key_digests(valid_keys: tuple) -> frozenset:
+    """Digest set for a key list, computed once per distinct list"""
+    return frozenset(api_key_digest(key) for key in valid_keys)
+
 def validate_api_key(api_key: str, valid_keys: list) -> bool:
     """
-    Validate API key with constant-time comparison
+    Validate API key without a timing side channel
+    
+    The candidate is only ever fed through HMAC under a per-process secret;
+    the digest lookup that follows compares values an attacker cannot
+    predict, so its timing says nothing about the valid keys.
     
     Args:
         api_key: Key to validate
@@ -349,19 +573,26 @@ def validate_api_key(api_key: str, valid_keys: list) -> bool:
     Returns:
         True if valid
     """
-    import hmac
-    
     if not api_key or not valid_keys:
         return False
     
-    # Constant-time comparison to prevent timing attacks
-    for valid_key in valid_keys:
-        if hmac.compare_digest(api_key, valid_key):
-            return True
-    
-    return False
+    # HMAC the candidate and look it up, instead of comparing it against
+    # every valid key in turn
+    return api_key_digest(api_key) in _valid_key_digests(tuple(valid_keys))
 
 # ===== CONTENT SECURITY POLICY =====
+_CSP_HEADER = "; ".join([
+    "default-src 'self'",
+    "script-src 'self' 'unsafe-inline' https://cdnjs.cloudflare.com",
+    "style-src 'self' 'unsafe-inline'",
+    "img-src 'self' data: https:",
+    "font-src 'self' data:",
+    "connect-src 'self' https://api.anthropic.com",
+    "frame-ancestors 'none'",
+    "base-uri 'self'",
+    "form-action 'self'"
+])
+
 def get_csp_header() -> str:
     """
     Get Content Security Policy header value
@@ -369,19 +600,7 @@ def get_csp_header() -> str:
     Returns:
         CSP header string
     """
-    policy = [
-        "default-src 'self'",
-        "script-src 'self' 'unsafe-inline' https://cdnjs.cloudflare.com",
-        "style-src 'self' 'unsafe-inline'",
-        "img-src 'self' data: https:",
-        "font-src 'self' data:",
-        "connect-src 'self' https://api.anthropic.com",
-        "frame-ancestors 'none'",
-        "base-uri 'self'",
-        "form-action 'self'"
-    ]
-    
-    return "; ".join(policy)
+    return _CSP_HEADER
 
 # ===== EXPORT =====
 __all__ = [
@@ -389,5 +608,7 @@ __all__ = [
     'QueryRequest',
     'SecureResponseBuilder',
     'validate_api_key',
+    'api_key_digest',
+    'utc_now_iso',
     'get_csp_header'
 ]
@@ -0,0 +1,48 @@
+"""
+SenseForge Serialization
+Shared JSON encoder and timestamp helper for responses, metrics and logs.
+"""
+from datetime import datetime, timezone
+from typing import Any
+import time
+
+import orjson
+
+# [whole second it was formatted, ISO string]; shared by everything emitted in that second
+_TS_CACHE = [0, ""]
+
+def utc_now_iso() -> str:
+    """Current UTC time as ISO 8601, reformatted at most once per second"""
+    sec = int(time.time())
+    if sec != _TS_CACHE[0]:
+        _TS_CACHE[1] = datetime.fromtimestamp(sec, timezone.utc).isoformat(
+            timespec='seconds'
+        ).replace('+00:00', 'Z')
+        _TS_CACHE[0] = sec
+    return _TS_CACHE[1]
+
+def _json_default(obj: Any) -> Any:
+    """Fallback for types orjson doesn't serialize natively"""
+    if hasattr(obj, 'model_dump'):
+        # Pydantic models
+        return obj.model_dump()
+    if hasattr(obj, 'tolist'):
+        # Only non-contiguous / unsupported numpy dtypes end up here
+        return obj.tolist()
+    return str(obj)
+
+_JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+
+def dumps(obj: Any, option: int = 0) -> bytes:
+    """
+    Serialize a payload we emit (response, snapshot, log record) to JSON bytes
+
+    Datetimes, UUIDs and numpy arrays are handled natively by orjson.
+
+    Args:
+        obj: Payload
+        option: Extra orjson options, e.g. orjson.OPT_INDENT_2
+    """
+    return orjson.dumps(obj, default=_json_default, option=_JSON_OPTIONS | option)
+
+__all__ = ['dumps', 'utc_now_iso']
@@ -4,65 +4,33 @@ Production-ready with comprehensive security controls
 """
 import uvicorn
 from starlette.applications import Starlette
-from starlette.responses import JSONResponse, Response
+from starlette.responses import Response, StreamingResponse
 from starlette.routing import Route
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from starlette.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers
 from starlette.middleware.httpsredirect import HTTPSRedirectMiddleware
-import json
+import orjson
 import os
 import asyncio
+import hashlib
 import signal
 import sys
+import threading
+import time
 import uuid
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-
-# Custom JSON encoder for datetime objects
-class DateTimeEncoder(json.JSONEncoder):
-    def default(self, obj):
-        from datetime import date, datetime
-        from uuid import UUID
-        if isinstance(obj, (datetime, date)):
-            return obj.isoformat()
-        if isinstance(obj, UUID):
-            return str(obj)
-        return super().default(obj)
-
-# Helper for recursive serialization
-def make_serializable(obj):
-    from datetime import date, datetime
-    from uuid import UUID
-    from pydantic import BaseModel
-    import numpy as np
-    
-    if isinstance(obj, (datetime, date)):
-        return obj.isoformat()
-    if isinstance(obj, UUID):
-        return str(obj)
-    if isinstance(obj, BaseModel):
-        return make_serializable(obj.dict())
-    if isinstance(obj, (np.integer, np.floating)):
-        return float(obj) if isinstance(obj, np.floating) else int(obj)
-    if isinstance(obj, np.ndarray):
-        return make_serializable(obj.tolist())
-    if isinstance(obj, dict):
-        return {k: make_serializable(v) for k, v in obj.items()}
-    if isinstance(obj, list):
-        return [make_serializable(v) for v in obj]
-    return obj
+import torch
 
 # Security imports
-from security.validation import (
-    QueryRequest, 
-    SecureResponseBuilder,
-    get_csp_header
-)
+from security.validation import QueryRequest, SecureResponseBuilder
 from security.rate_limiter import RateLimitMiddleware, RateLimiter
-from security.auth import AuthenticationMiddleware
-from security.secrets import secrets_manager, validate_environment
+from security.auth import APIKeyManager, AuthenticationMiddleware
+from security.headers import SecurityHeadersMiddleware
+from security.secrets import validate_environment
 
 # Core components
 from perception.analyst import AnalystAgent
@@ -73,12 +41,48 @@ from planning.auditor import AuditorAgent
 from logging_setup import logger
 from reasoning_logger import reasoning_logger
 from metrics import metrics as metrics_tracker
+from serialization import utc_now_iso
+
+class ORJSONResponse(Response):
+    """JSON response rendered with orjson (datetimes, UUIDs and numpy natively)"""
+    media_type = "application/json"
+    
+    def render(self, content) -> bytes:
+        return SecureResponseBuilder.dumps(content)
+
+class EventStreamGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that sends text/event-stream responses uncompressed"""
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        async def select_sink(scope, receive, gzip_send):
+            # Chosen at response start: gzip buffers its input, which would
+            # hold server-sent events back until the stream ends
+            sink = gzip_send
+            
+            async def send_to_sink(message):
+                nonlocal sink
+                if message["type"] == "http.response.start":
+                    content_type = Headers(raw=message["headers"]).get("content-type", "")
+                    if content_type.startswith("text/event-stream"):
+                        sink = send
+                await sink(message)
+            
+            await self.app(scope, receive, send_to_sink)
+        
+        gzip = GZipMiddleware(select_sink, self.minimum_size, self.compresslevel)
+        await gzip(scope, receive, send)
 
 # ===== CONFIGURATION =====
 MODE = os.getenv('SENSEFORGE_MODE', 'mock')
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '*').split(',')
 ENABLE_AUTH = os.getenv('ENABLE_AUTH', 'false').lower() == 'true'
 ENABLE_HTTPS_REDIRECT = os.getenv('ENABLE_HTTPS_REDIRECT', 'false').lower() == 'true'
+# Bodies larger than this are validated off the event loop
+VALIDATION_THREAD_THRESHOLD = 2048  # bytes
 
 # Validate environment
 if not validate_environment():
@@ -87,18 +91,60 @@ if not validate_environment():
         sys.exit(1)
 
 # ===== COMPONENT INITIALIZATION =====
+# Sync torch/disk work runs here so it never blocks the event loop. Each
+# worker does single-threaded torch ops; the pool provides the parallelism
+_EXECUTOR = ThreadPoolExecutor(
+    max_workers=max(2, (os.cpu_count() or 2) // 2),
+    thread_name_prefix="jepa"
+)
+torch.set_num_threads(1)
+
+# Preallocated JEPA inputs for /query; each executor thread refills its own
+# state buffer, the action tensor is read-only
+_jepa_local = threading.local()
+_ACTION_TENSOR = torch.tensor([[1.0]], dtype=torch.float32)
+# Fixed input for the /health forward pass
+_HEALTH_TENSOR = torch.zeros(1, 3)
+
+HEALTH_CACHE_TTL = 5.0  # seconds
+_health_cache = {'ts': 0.0, 'result': None}
+_health_clock = time.monotonic  # module-local so tests can swap in a fake clock
+
 analyst = None
 jepa = None
+jepa_predict = None  # traced jepa.predict_next_state (eager fallback)
 memory = None
 strategist = None
 auditor = None
+agent_card = None  # parsed agent.json, loaded once at startup
+demo_page = None  # (static/index.html bytes, ETag), loaded once at startup
 
 async def initialize_components():
     """Initialize all agent components with error handling"""
-    global analyst, jepa, memory, strategist, auditor
+    global analyst, jepa, jepa_predict, memory, strategist, auditor, agent_card, demo_page
     
     logger.info(f"Initializing SenseForge components (mode: {MODE})...")
     
+    # Rotated API keys are picked up without a restart
+    if api_key_manager:
+        api_key_manager.start_reloading()
+    
+    # Agent card (static; served on every discovery request)
+    try:
+        with open("agent.json", "rb") as f:
+            agent_card = orjson.loads(f.read())
+        logger.info("✓ Agent card loaded")
+    except Exception as e:
+        logger.error(f"Agent card error: {e}")
+    
+    # Demo landing page (static)
+    try:
+        html = (Path(__file__).parent / "static" / "index.html").read_bytes()
+        demo_page = (html, f'"{hashlib.md5(html).hexdigest()}"')
+        logger.info("✓ Demo page loaded")
+    except OSError as e:
+        logger.warning(f"Demo page not available: {e}")
+    
     try:
         # Analyst
         analyst = AnalystAgent(mode=MODE)
@@ -115,6 +161,32 @@ async def initialize_components():
         else:
             logger.info("✓ JEPA initialized (no checkpoint)")
         
+        # The server only runs inference: disable dropout/batchnorm updates
+        # and autograd bookkeeping on the parameters
+        jepa.eval()
+        for param in jepa.parameters():
+            param.requires_grad_(False)
+        
+        # Trace the prediction path once for the fixed (1, 3) / (1, 1) request
+        # shape, then freeze it for inference. Freezing folds the weights into
+        # the graph, so this must run after the checkpoint is loaded.
+        try:
+            with torch.no_grad():
+                traced = torch.jit.trace_module(
+                    jepa, {'predict_next_state': (torch.zeros(1, 3), torch.zeros(1, 1))}
+                )
+            try:
+                traced = torch.jit.optimize_for_inference(
+                    traced, other_methods=['predict_next_state']
+                )
+            except Exception as e:
+                logger.warning(f"JEPA inference optimization skipped: {e}")
+            jepa_predict = traced.predict_next_state
+            logger.info("✓ JEPA prediction traced")
+        except Exception as e:
+            logger.warning(f"JEPA tracing failed, using eager prediction: {e}")
+            jepa_predict = jepa.predict_next_state
+        
         # Memory
         memory = LettaMemory(
             agent_id="senseforge-risk-oracle-001",
@@ -143,13 +215,18 @@ async def shutdown_components():
     logger.info("Initiating graceful shutdown...")
     
     try:
+        if api_key_manager:
+            await api_key_manager.stop_reloading()
+        
         if analyst:
             await analyst.cleanup()
             logger.info("✓ Analyst shutdown")
         
         if jepa:
             try:
-                jepa.save_checkpoint()
+                await asyncio.get_running_loop().run_in_executor(
+                    _EXECUTOR, jepa.save_checkpoint
+                )
                 logger.info("✓ JEPA checkpoint saved")
             except Exception as e:
                 logger.warning(f"Could not save JEPA checkpoint: {e}")
@@ -169,7 +246,8 @@ async def shutdown_components():
 
 # ===== SECURITY MIDDLEWARE =====
 middleware = [
-    Middleware(GZipMiddleware, minimum_size=1000),
+    # Outermost, so rate-limit and auth rejections get the headers too
+    Middleware(SecurityHeadersMiddleware),
     Middleware(
         CORSMiddleware,
         allow_origins=ALLOWED_HOSTS if ALLOWED_HOSTS != ['*'] else ['*'],
@@ -181,14 +259,25 @@ middleware = [
     Middleware(RateLimitMiddleware, rate_limiter=RateLimiter(
         rate=int(os.getenv('RATE_LIMIT', 100)),
         per=60,
-        storage='redis' if os.getenv('REDIS_URL') else 'memory',
+        storage=os.getenv(
+            'RATE_LIMIT_STORAGE',
+            'redis' if os.getenv('REDIS_URL') else 'memory'
+        ),
         redis_url=os.getenv('REDIS_URL')
     )),
 ]
 
-# Add authentication if enabled
+# Compress only large bodies (full /query results); GZIP_MIN_SIZE=0 turns
+# it off when a reverse proxy already compresses responses
+GZIP_MIN_SIZE = int(os.getenv('GZIP_MIN_SIZE', 4096))
+if GZIP_MIN_SIZE > 0:
+    middleware.insert(1, Middleware(EventStreamGZipMiddleware, minimum_size=GZIP_MIN_SIZE))
+
+# Add authentication if enabled; the key file reload poll is started and
+# stopped with the app (see initialize_components/shutdown_components)
+api_key_manager = APIKeyManager() if ENABLE_AUTH else None
 if ENABLE_AUTH:
-    middleware.append(Middleware(AuthenticationMiddleware))
+    middleware.append(Middleware(AuthenticationMiddleware, key_manager=api_key_manager))
     logger.info("🔒 Authentication enabled")
 
 # Add host validation if specified
@@ -208,23 +297,94 @@ async def get_agent_card(request):
     Returns Agent Card for Verisense network discovery
     PUBLIC ENDPOINT
     """
-    try:
-        with open("agent.json", "r") as f:
-            card = json.load(f)
-        
-        # Add dynamic status
-        card['last_updated'] = datetime.utcnow().isoformat() + 'Z'
-        card['status'] = 'online'
-        card['mode'] = MODE
-        
-        return JSONResponse(card)
-    
-    except Exception as e:
-        logger.error(f"Agent card error: {e}")
-        return JSONResponse(
+    if agent_card is None:
+        return ORJSONResponse(
             {"error": "Agent card unavailable"},
             status_code=500
         )
+    
+    # Add dynamic status to a shallow copy of the cached card
+    card = dict(agent_card)
+    card['last_updated'] = utc_now_iso()
+    card['status'] = 'online'
+    card['mode'] = MODE
+    
+    return ORJSONResponse(card)
+
+def _predict_liquidity(liquidity: float, volatility: float, governance: float) -> float:
+    """JEPA prediction for one state; runs on _EXECUTOR"""
+    view = getattr(_jepa_local, 'view', None)
+    if view is None:
+        _jepa_local.state = torch.empty((1, 3), dtype=torch.float32)
+        # numpy view sharing the tensor's memory; element writes skip torch dispatch
+        view = _jepa_local.view = _jepa_local.state.numpy()
+    row = view[0]
+    row[0] = liquidity
+    row[1] = volatility
+    row[2] = governance
+    
+    with torch.inference_mode():
+        predicted = jepa_predict(_jepa_local.state, _ACTION_TENSOR)
+    return float(predicted[0][0])
+
+def _health_forward():
+    """/health JEPA probe; runs on _EXECUTOR"""
+    with torch.inference_mode():
+        jepa(_HEALTH_TENSOR)
+
+async def _check_components():
+    """Probe each component; returns (components, overall_status, status_code)"""
+    components = {}
+    
+    # Test Analyst
+    try:
+        if analyst:
+            # Quick connectivity test
+            components['analyst'] = 'healthy'
+        else:
+            components['analyst'] = 'unavailable'
+    except Exception as e:
+        components['analyst'] = f'unhealthy: {str(e)}'
+    
+    # Test JEPA
+    try:
+        if jepa:
+            # Test forward pass
+            await asyncio.get_running_loop().run_in_executor(_EXECUTOR, _health_forward)
+            components['jepa'] = 'healthy'
+        else:
+            components['jepa'] = 'unavailable'
+    except Exception as e:
+        components['jepa'] = f'unhealthy: {str(e)}'
+    
+    # Test Memory
+    try:
+        if memory:
+            stats = memory.get_memory_stats()
+            components['memory'] = f"healthy ({stats['mode']})"
+        else:
+            components['memory'] = 'unavailable'
+    except Exception as e:
+        components['memory'] = f'unhealthy: {str(e)}'
+    
+    # Test Strategist
+    components['strategist'] = 'healthy' if strategist else 'unavailable'
+    
+    # Test Auditor
+    components['auditor'] = 'healthy' if auditor else 'unavailable'
+    
+    # Overall status
+    unhealthy_count = sum(
+        1 for status in components.values() 
+        if 'unhealthy' in status or 'unavailable' in status
+    )
+    
+    if unhealthy_count == 0:
+        return components, 'healthy', 200
+    elif unhealthy_count < len(components) / 2:
+        return components, 'degraded', 200
+    else:
+        return components, 'unhealthy', 503
 
 async def health_check(request):
     """
@@ -234,78 +394,28 @@ async def health_check(request):
     request_id = str(uuid.uuid4())
     
     try:
-        # Component health checks
-        components = {}
-        
-        # Test Analyst
-        try:
-            if analyst:
-                # Quick connectivity test
-                components['analyst'] = 'healthy'
-            else:
-                components['analyst'] = 'unavailable'
-        except Exception as e:
-            components['analyst'] = f'unhealthy: {str(e)}'
-        
-        # Test JEPA
-        try:
-            if jepa:
-                # Test forward pass
-                import torch
-                test_tensor = torch.randn(1, 3)
-                jepa(test_tensor)
-                components['jepa'] = 'healthy'
-            else:
-                components['jepa'] = 'unavailable'
-        except Exception as e:
-            components['jepa'] = f'unhealthy: {str(e)}'
-        
-        # Test Memory
-        try:
-            if memory:
-                stats = memory.get_memory_stats()
-                components['memory'] = f"healthy ({stats['mode']})"
-            else:
-                components['memory'] = 'unavailable'
-        except Exception as e:
-            components['memory'] = f'unhealthy: {str(e)}'
-        
-        # Test Strategist
-        components['strategist'] = 'healthy' if strategist else 'unavailable'
-        
-        # Test Auditor
-        components['auditor'] = 'healthy' if auditor else 'unavailable'
-        
-        # Overall status
-        unhealthy_count = sum(
-            1 for status in components.values() 
-            if 'unhealthy' in status or 'unavailable' in status
-        )
-        
-        if unhealthy_count == 0:
-            overall_status = 'healthy'
-            status_code = 200
-        elif unhealthy_count < len(components) / 2:
-            overall_status = 'degraded'
-            status_code = 200
-        else:
-            overall_status = 'unhealthy'
-            status_code = 503
+        # Component probes are reused for HEALTH_CACHE_TTL seconds; liveness
+        # probes would otherwise run a JEPA forward pass every few seconds
+        now = _health_clock()
+        if _health_cache['result'] is None or now - _health_cache['ts'] >= HEALTH_CACHE_TTL:
+            _health_cache['result'] = await _check_components()
+            _health_cache['ts'] = now
+        components, overall_status, status_code = _health_cache['result']
         
         health = {
             'status': overall_status,
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'timestamp': utc_now_iso(),
             'mode': MODE,
             'components': components,
             'version': '2.1-secure',
             'request_id': request_id
         }
         
-        return JSONResponse(health, status_code=status_code)
+        return ORJSONResponse(health, status_code=status_code)
     
     except Exception as e:
         logger.error(f"Health check failed: {e}", exc_info=True)
-        return JSONResponse(
+        return ORJSONResponse(
             {
                 'status': 'unhealthy',
                 'error': 'Health check failed',
@@ -314,53 +424,47 @@ async def health_check(request):
             status_code=503
         )
 
+# Prometheus exposition text, prebuilt; only the loss value changes per scrape
+_METRICS_UP = (
+    b'# HELP senseforge_up System status (1=up, 0=down)\n'
+    b'# TYPE senseforge_up gauge\n'
+    b'senseforge_up 1\n'
+)
+_METRICS_LOSS_TEMPLATE = (
+    b'# HELP senseforge_training_loss Current training loss\n'
+    b'# TYPE senseforge_training_loss gauge\n'
+    b'senseforge_training_loss %r\n'
+)
+
 async def metrics_endpoint(request):
     """
     Prometheus metrics endpoint
     INTERNAL ENDPOINT (should require auth or IP whitelist)
     """
     try:
-        # Basic metrics in Prometheus format
-        metrics = []
-        
-        # System metrics
-        metrics.append('# HELP senseforge_up System status (1=up, 0=down)')
-        metrics.append('# TYPE senseforge_up gauge')
-        metrics.append('senseforge_up 1')
-        
         # Component metrics
         if jepa and jepa.training_history:
-            metrics.append('# HELP senseforge_training_loss Current training loss')
-            metrics.append('# TYPE senseforge_training_loss gauge')
-            metrics.append(f'senseforge_training_loss {jepa.training_history[-1]}')
-        
-        metrics_text = '\n'.join(metrics)
+            body = _METRICS_UP + _METRICS_LOSS_TEMPLATE % jepa.training_history[-1]
+        else:
+            body = _METRICS_UP
         
-        return Response(metrics_text, media_type="text/plain")
+        return Response(body, media_type="text/plain; version=0.0.4")
     
     except Exception as e:
         logger.error(f"Metrics generation failed: {e}")
-        return JSONResponse({"error": "Metrics unavailable"}, status_code=500)
+        return ORJSONResponse({"error": "Metrics unavailable"}, status_code=500)
 
 async def dashboard_metrics(request):
     """JSON metrics for dashboard consumption"""
     try:
-        accuracy_stats = metrics_tracker.get_accuracy_stats()
-        training_stats = metrics_tracker.get_training_stats()
-        recent_predictions = metrics_tracker.get_recent_predictions(limit=10)
-
-        response = {
-            "accuracy": accuracy_stats,
-            "training": training_stats,
-            "recent_predictions": recent_predictions,
-            "timestamp": datetime.utcnow().isoformat() + 'Z'
-        }
-
-        return JSONResponse(response)
+        return Response(
+            metrics_tracker.get_snapshot_bytes(recent_limit=10),
+            media_type="application/json"
+        )
 
     except Exception as e:
         logger.error(f"Dashboard metrics failed: {e}", exc_info=True)
-        return JSONResponse(
+        return ORJSONResponse(
             {
                 "error": "metrics_unavailable",
                 "message": "Unable to load dashboard metrics"
@@ -368,172 +472,199 @@ async def dashboard_metrics(request):
             status_code=500
         )
 
+async def _validate_query(request, request_id: str):
+    """
+    Parse and validate a /query body.
+    Returns (QueryRequest, None) or (None, error response).
+    """
+    raw_body = await request.body()
+    body = await request.json()
+    
+    # Validate with Pydantic (includes sanitization); large payloads are
+    # sanitized in a worker thread so the regex work doesn't stall the loop
+    try:
+        if len(raw_body) > VALIDATION_THREAD_THRESHOLD:
+            validated_request = await asyncio.to_thread(QueryRequest, **body)
+        else:
+            validated_request = QueryRequest(**body)
+    except Exception as e:
+        logger.warning(f"[{request_id}] Validation failed: {e}")
+        return None, ORJSONResponse(
+            SecureResponseBuilder.error_response(
+                error_type="validation_error",
+                message=str(e),
+                request_id=request_id,
+                expose_details=(MODE != 'live')
+            ),
+            status_code=400
+        )
+    
+    # Lazy %-args: the message is only formatted if a handler accepts it
+    logger.info("[%s] Query: %.100s...", request_id, validated_request.query)
+    
+    # Check components
+    if not all([analyst, jepa, strategist, auditor]):
+        return None, ORJSONResponse(
+            SecureResponseBuilder.error_response(
+                error_type="service_unavailable",
+                message="Service initializing",
+                request_id=request_id
+            ),
+            status_code=503
+        )
+    
+    return validated_request, None
+
+async def _run_pipeline(request_id: str, start_time: int):
+    """
+    Run Analyst -> JEPA -> Strategist -> Auditor for one query.
+    
+    Yields ('step', {...}) as each step completes, then ('done', response_data).
+    The reasoning chain must already be started.
+    """
+    # Hot-path bindings: a monotonic ns clock instead of datetime objects
+    _now = time.perf_counter_ns
+    log_step = reasoning_logger.log_step
+    
+    # === STEP 1: Analyst ===
+    step_start = _now()
+    events_buffer = await analyst.get_events(5, timeout=5.0)
+    if len(events_buffer) < 5:
+        logger.warning("Event gathering timeout")
+    
+    current_state = analyst.normalize_state(events_buffer, [])
+    state_dict = current_state.dict()
+    
+    step_duration = (_now() - step_start) / 1e6
+    log_step(
+        component="Analyst",
+        input_data={"events_count": len(events_buffer)},
+        output_data=state_dict,
+        reasoning=f"Normalized {len(events_buffer)} events",
+        confidence=1.0,
+        duration_ms=step_duration
+    )
+    yield 'step', {"component": "Analyst", "output": state_dict, "duration_ms": step_duration}
+    
+    # === STEP 2: JEPA Prediction ===
+    step_start = _now()
+    
+    predicted_liquidity = await asyncio.get_running_loop().run_in_executor(
+        _EXECUTOR,
+        _predict_liquidity,
+        current_state.liquidity_depth,
+        current_state.volatility_index,
+        current_state.governance_risk_score
+    )
+    
+    confidence = 0.85 if len(jepa.training_history) > 10 else 0.70
+    
+    step_duration = (_now() - step_start) / 1e6
+    log_step(
+        component="Brain (JEPA)",
+        input_data={"state": state_dict},
+        output_data={"predicted_liquidity": predicted_liquidity},
+        reasoning=f"Predicted liquidity: ${predicted_liquidity:,.0f}",
+        confidence=confidence,
+        duration_ms=step_duration
+    )
+    yield 'step', {
+        "component": "Brain (JEPA)",
+        "output": {"predicted_liquidity": predicted_liquidity, "confidence": confidence},
+        "duration_ms": step_duration
+    }
+    
+    # === STEP 3: Strategist ===
+    step_start = _now()
+    
+    strategy = await strategist.analyze_risk(state_dict, predicted_liquidity)
+    
+    step_duration = (_now() - step_start) / 1e6
+    log_step(
+        component="Strategist",
+        input_data={"predicted_liquidity": predicted_liquidity},
+        output_data=strategy,
+        reasoning=strategy.get('reasoning', ''),
+        confidence=strategy.get('confidence'),
+        duration_ms=step_duration
+    )
+    yield 'step', {"component": "Strategist", "output": strategy, "duration_ms": step_duration}
+    
+    # === STEP 4: Auditor ===
+    step_start = _now()
+    
+    audit_result = await auditor.validate_action(strategy)
+    
+    step_duration = (_now() - step_start) / 1e6
+    log_step(
+        component="Auditor",
+        input_data=strategy,
+        output_data=audit_result,
+        reasoning=audit_result.get('auditor_comments', ''),
+        confidence=1.0,
+        duration_ms=step_duration
+    )
+    yield 'step', {"component": "Auditor", "output": audit_result, "duration_ms": step_duration}
+    
+    # === BUILD RESPONSE ===
+    response_data = {
+        "analysis": {
+            "current_state": {
+                "liquidity_depth": current_state.liquidity_depth,
+                "volatility_index": current_state.volatility_index,
+                "governance_risk_score": current_state.governance_risk_score,
+            },
+            "prediction": {
+                "predicted_liquidity": predicted_liquidity,
+                "change_amount": predicted_liquidity - current_state.liquidity_depth,
+                "change_percent": (
+                    ((predicted_liquidity - current_state.liquidity_depth) / 
+                     current_state.liquidity_depth * 100)
+                    if current_state.liquidity_depth > 0 else 0
+                ),
+                "confidence": confidence
+            },
+            "risk_assessment": strategy,
+            "audit_verification": audit_result
+        },
+        "metadata": {
+            "events_processed": len(events_buffer),
+            "model_version": "jepa_v2.1-secure",
+            "mode": MODE
+        }
+    }
+    
+    # Finalize reasoning
+    total_duration = (_now() - start_time) / 1e6
+    await reasoning_logger.finalize_chain_async(response_data, total_duration)
+    
+    logger.info(
+        "[%s] Success (%.2fms) - Risk: %s",
+        request_id, total_duration, strategy.get('risk_level')
+    )
+    
+    yield 'done', response_data
+
 async def handle_query(request):
     """
     Handle A2A risk analysis queries with full security
     PROTECTED ENDPOINT
     """
     request_id = str(uuid.uuid4())
-    start_time = datetime.now()
+    start_time = time.perf_counter_ns()
     
     # Start reasoning chain
     reasoning_logger.start_chain(str(request.url))
     
     try:
-        # Parse request body
-        body = await request.json()
-        
-        # Validate with Pydantic (includes sanitization)
-        try:
-            validated_request = QueryRequest(**body)
-        except Exception as e:
-            logger.warning(f"[{request_id}] Validation failed: {e}")
-            return JSONResponse(
-                SecureResponseBuilder.error_response(
-                    error_type="validation_error",
-                    message=str(e),
-                    request_id=request_id,
-                    expose_details=(MODE != 'live')
-                ),
-                status_code=400
-            )
-        
-        query_text = validated_request.query
-        logger.info(f"[{request_id}] Query: {query_text[:100]}...")
-        
-        # Check components
-        if not all([analyst, jepa, strategist, auditor]):
-            return JSONResponse(
-                SecureResponseBuilder.error_response(
-                    error_type="service_unavailable",
-                    message="Service initializing",
-                    request_id=request_id
-                ),
-                status_code=503
-            )
-        
-        # === STEP 1: Analyst ===
-        step_start = datetime.now()
-        events_buffer = []
-        
-        try:
-            async with asyncio.timeout(5):
-                async for event in analyst.stream_liquidity_events():
-                    events_buffer.append(event)
-                    if len(events_buffer) >= 5:
-                        break
-        except asyncio.TimeoutError:
-            logger.warning("Event gathering timeout")
-        
-        current_state = analyst.normalize_state(events_buffer, [])
-        
-        step_duration = (datetime.now() - step_start).total_seconds() * 1000
-        reasoning_logger.log_step(
-            component="Analyst",
-            input_data={"events_count": len(events_buffer)},
-            output_data=make_serializable(current_state.dict()),
-            reasoning=f"Normalized {len(events_buffer)} events",
-            confidence=1.0,
-            duration_ms=step_duration
-        )
-        
-        # === STEP 2: JEPA Prediction ===
-        step_start = datetime.now()
-        
-        import torch
-        state_tensor = torch.tensor([[
-            current_state.liquidity_depth,
-            current_state.volatility_index,
-            current_state.governance_risk_score
-        ]], dtype=torch.float32)
-        
-        action_tensor = torch.tensor([[1.0]], dtype=torch.float32)
-        predicted_state_tensor = jepa.predict_next_state(state_tensor, action_tensor)
-        predicted_liquidity = float(predicted_state_tensor[0][0])
-        
-        confidence = 0.85 if len(jepa.training_history) > 10 else 0.70
+        validated_request, error = await _validate_query(request, request_id)
+        if error is not None:
+            return error
         
-        step_duration = (datetime.now() - step_start).total_seconds() * 1000
-        reasoning_logger.log_step(
-            component="Brain (JEPA)",
-            input_data={"state": make_serializable(current_state.dict())},
-            output_data={"predicted_liquidity": predicted_liquidity},
-            reasoning=f"Predicted liquidity: ${predicted_liquidity:,.0f}",
-            confidence=confidence,
-            duration_ms=step_duration
-        )
-        
-        # === STEP 3: Strategist ===
-        step_start = datetime.now()
-        
-        strategy = await strategist.analyze_risk(
-            current_state.dict(),
-            predicted_liquidity
-        )
-        
-        step_duration = (datetime.now() - step_start).total_seconds() * 1000
-        reasoning_logger.log_step(
-            component="Strategist",
-            input_data={"predicted_liquidity": predicted_liquidity},
-            output_data=make_serializable(strategy),
-            reasoning=strategy.get('reasoning', ''),
-            confidence=strategy.get('confidence'),
-            duration_ms=step_duration
-        )
-        
-        # === STEP 4: Auditor ===
-        step_start = datetime.now()
-        
-        audit_result = await auditor.validate_action(strategy)
-        
-        step_duration = (datetime.now() - step_start).total_seconds() * 1000
-        reasoning_logger.log_step(
-            component="Auditor",
-            input_data=make_serializable(strategy),
-            output_data=make_serializable(audit_result),
-            reasoning=audit_result.get('auditor_comments', ''),
-            confidence=1.0,
-            duration_ms=step_duration
-        )
-        
-        # === BUILD RESPONSE ===
-        response_data = {
-            "analysis": {
-                "current_state": {
-                    "liquidity_depth": current_state.liquidity_depth,
-                    "volatility_index": current_state.volatility_index,
-                    "governance_risk_score": current_state.governance_risk_score,
-                },
-                "prediction": {
-                    "predicted_liquidity": predicted_liquidity,
-                    "change_amount": predicted_liquidity - current_state.liquidity_depth,
-                    "change_percent": (
-                        ((predicted_liquidity - current_state.liquidity_depth) / 
-                         current_state.liquidity_depth * 100)
-                        if current_state.liquidity_depth > 0 else 0
-                    ),
-                    "confidence": confidence
-                },
-                "risk_assessment": strategy,
-                "audit_verification": audit_result
-            },
-            "metadata": {
-                "events_processed": len(events_buffer),
-                "model_version": "jepa_v2.1-secure",
-                "mode": MODE
-            }
-        }
-        
-        # Finalize reasoning
-        total_duration = (datetime.now() - start_time).total_seconds() * 1000
-        # Finalize reasoning
-        total_duration = (datetime.now() - start_time).total_seconds() * 1000
-        reasoning_logger.finalize_chain(make_serializable(response_data), total_duration)
-        
-        logger.info(
-            f"[{request_id}] Success ({total_duration:.2f}ms) - "
-            f"Risk: {strategy.get('risk_level')}"
-        )
+        # Batch mode: run the same pipeline as /query/stream, keep the result
+        async for event, payload in _run_pipeline(request_id, start_time):
+            if event == 'done':
+                response_data = payload
         
         # Build secure response
         response = SecureResponseBuilder.success_response(
@@ -541,22 +672,12 @@ async def handle_query(request):
             request_id
         )
         
-        # Manually sanitize response data before JSONResponse
-        safe_response = make_serializable(response)
-        
-        # Add security headers
-        json_response = JSONResponse(safe_response)
-        json_response.headers['X-Content-Type-Options'] = 'nosniff'
-        json_response.headers['X-Frame-Options'] = 'DENY'
-        json_response.headers['X-XSS-Protection'] = '1; mode=block'
-        json_response.headers['Content-Security-Policy'] = get_csp_header()
-        json_response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
-        
-        return json_response
+        # Security headers are added by SecurityHeadersMiddleware
+        return ORJSONResponse(response)
     
     except asyncio.TimeoutError:
         logger.error(f"[{request_id}] Timeout")
-        return JSONResponse(
+        return ORJSONResponse(
             SecureResponseBuilder.error_response(
                 error_type="timeout",
                 message="Request timeout",
@@ -566,14 +687,8 @@ async def handle_query(request):
         )
     
     except Exception as e:
-        import traceback
-        with open("error.log", "w") as f:
-            f.write(f"Error: {str(e)}\n")
-            f.write(traceback.format_exc())
-            
         logger.error(f"[{request_id}] Error: {e}", exc_info=True)
         
-        # Ensure error response is also serializable
         error_data = SecureResponseBuilder.error_response(
             error_type="internal_error",
             message=str(e),
@@ -581,19 +696,92 @@ async def handle_query(request):
             expose_details=(MODE != 'live')
         )
         
-        return JSONResponse(
-            make_serializable(error_data),
+        return ORJSONResponse(error_data, status_code=500)
+
+def _sse_event(event: str, payload) -> bytes:
+    """Encode one server-sent event"""
+    return (
+        b'event: ' + event.encode() + b'\ndata: '
+        + SecureResponseBuilder.dumps(payload) + b'\n\n'
+    )
+
+async def handle_query_stream(request):
+    """
+    Same analysis as /query, streamed as server-sent events:
+    one 'step' event per component, then 'done' with the full response
+    PROTECTED ENDPOINT
+    """
+    request_id = str(uuid.uuid4())
+    start_time = time.perf_counter_ns()
+    
+    # Start reasoning chain
+    reasoning_logger.start_chain(str(request.url))
+    
+    try:
+        validated_request, error = await _validate_query(request, request_id)
+    except Exception as e:
+        logger.error(f"[{request_id}] Error: {e}", exc_info=True)
+        return ORJSONResponse(
+            SecureResponseBuilder.error_response(
+                error_type="internal_error",
+                message=str(e),
+                request_id=request_id,
+                expose_details=(MODE != 'live')
+            ),
             status_code=500
         )
+    if error is not None:
+        return error
+    
+    async def events():
+        try:
+            async for event, payload in _run_pipeline(request_id, start_time):
+                if event == 'done':
+                    payload = SecureResponseBuilder.success_response(payload, request_id)
+                yield _sse_event(event, payload)
+        except Exception as e:
+            # Headers are already sent; report the failure in-band
+            logger.error(f"[{request_id}] Error: {e}", exc_info=True)
+            yield _sse_event('error', SecureResponseBuilder.error_response(
+                error_type="internal_error",
+                message=str(e),
+                request_id=request_id,
+                expose_details=(MODE != 'live')
+            ))
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Left uncompressed by EventStreamGZipMiddleware
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Request-ID': request_id,
+        }
+    )
 
 # ===== ROUTES =====
+def _etag_matches(etag: str, if_none_match: str) -> bool:
+    """If-None-Match check: '*' or any listed tag, compared weakly (W/ ignored)"""
+    if if_none_match.strip() == '*':
+        return True
+    return any(
+        tag.strip().removeprefix('W/') == etag
+        for tag in if_none_match.split(',')
+    )
+
 async def serve_demo(request):
     """Serve demo landing page for judges"""
-    from pathlib import Path
-    html_path = Path(__file__).parent / "static" / "index.html"
-    with open(html_path, 'r', encoding='utf-8') as f:
-        html_content = f.read()
-    return Response(html_content, media_type="text/html")
+    if demo_page is None:
+        return Response("Demo page unavailable", status_code=404, media_type="text/plain")
+    
+    body, etag = demo_page
+    if _etag_matches(etag, request.headers.get('if-none-match', '')):
+        return Response(status_code=304, headers={'ETag': etag})
+    return Response(
+        body,
+        media_type="text/html",
+        headers={'ETag': etag, 'Cache-Control': 'public, max-age=300'}
+    )
 
 routes = [
     Route("/", serve_demo, methods=["GET"]),
@@ -601,6 +789,7 @@ routes = [
     Route("/health", health_check, methods=["GET"]),
     Route("/metrics", metrics_endpoint, methods=["GET"]),
     Route("/query", handle_query, methods=["POST"]),
+    Route("/query/stream", handle_query_stream, methods=["POST"]),
 ]
 
 # ===== APPLICATION =====
@@ -648,10 +837,33 @@ if __name__ == "__main__":
         else:
             logger.warning("⚠️  SSL/TLS not configured!")
     
+    # Prefer the libuv event loop and C HTTP parser when they are installed
+    try:
+        import uvloop  # noqa: F401
+        loop = "uvloop"
+        logger.info("⚡ uvloop event loop enabled")
+    except ImportError:
+        loop = "asyncio"
+        logger.info("uvloop not installed, using default asyncio event loop")
+    
+    try:
+        import httptools  # noqa: F401
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+    
+    # Multiple workers need an import string so each process loads its own
+    # app; use RATE_LIMIT_STORAGE=shm or redis so limits are shared
+    workers = int(os.getenv('WEB_CONCURRENCY', 1))
+    
     uvicorn.run(
-        app,
+        "server:app" if workers > 1 else app,
         host="0.0.0.0",
         port=int(os.getenv('PORT', 8000)),
         log_level="info" if MODE == 'live' else "debug",
+        loop=loop,
+        http=http,
+        workers=workers,
+        access_log=False,
         **ssl_config
     )
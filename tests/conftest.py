@@ -1,13 +1,85 @@
 """
 Pytest configuration and shared fixtures
 """
+import os
+import sys
+
+# Single-threaded torch: the test tensors are far too small for the
+# intra-op pool to pay off. Must be set before torch is imported.
+os.environ.setdefault("OMP_NUM_THREADS", "1")
+
 import pytest
 import asyncio
+import torch
+
+torch.set_num_threads(1)
+torch.set_num_interop_threads(1)
+
+# Shared JEPA inputs; tests only read them, never modify in place
+STATE_TENSOR = torch.tensor([[10000000.0, 0.5, 0.3]])
+ACTION_TENSOR = torch.tensor([[1.0]])
+
+def pytest_configure(config):
+    """Register xdist_group so the mark is known even without pytest-xdist"""
+    config.addinivalue_line(
+        "markers", "xdist_group(name): run these tests on one xdist worker"
+    )
+    config.addinivalue_line(
+        "markers", "timing: asserts on wall-clock measurements"
+    )
+
+# tryfirst: xdist reads xdist_group marks in its own collection hook
+@pytest.hookimpl(tryfirst=True)
+def pytest_collection_modifyitems(items):
+    """Run every timing test on one xdist worker so they never overlap each other"""
+    for item in items:
+        if item.get_closest_marker("timing"):
+            item.add_marker(pytest.mark.xdist_group(name="timing"))
+
+# Configure async test support: pytest-asyncio (>= 1.4) builds every test
+# loop from this factory, so async tests run on uvloop when it is installed
+def pytest_asyncio_loop_factories(config, item):
+    """Event loop factory for async tests (uvloop, else the default)"""
+    if sys.platform != "win32":
+        try:
+            import uvloop
+            return {"uvloop": uvloop.new_event_loop}
+        except ImportError:
+            pass
+    return {"asyncio": asyncio.new_event_loop}
+
+@pytest.fixture(scope="session")
+def mock_events():
+    """One batch of mock-mode liquidity events, generated once per session"""
+    from perception.analyst import AnalystAgent
+    
+    async def gather():
+        # The mock stream paces events 2s apart by default; skip the pacing
+        analyst = AnalystAgent(mode="mock", mock_interval=0)
+        try:
+            return await analyst.get_events(8, timeout=5.0)
+        finally:
+            await analyst.cleanup()
+    
+    return asyncio.run(gather())
+
+@pytest.fixture
+def isolate_training_files(monkeypatch, tmp_path):
+    """Point the global metrics tracker and TrainingRepository at tmp_path, not data/"""
+    from metrics import metrics
+    from database.repository import TrainingRepository
+    
+    monkeypatch.setattr(metrics, "metrics_file", tmp_path / "metrics.json")
+    monkeypatch.setattr(
+        TrainingRepository, "episodes_file", str(tmp_path / "training_episodes.jsonl")
+    )
+
+@pytest.fixture(scope="session")
+def state_tensor():
+    """Reference (1, 3) market state"""
+    return STATE_TENSOR
 
-# Configure async test support
 @pytest.fixture(scope="session")
-def event_loop():
-    """Create event loop for async tests"""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
+def action_tensor():
+    """Reference (1, 1) action: proposal passes"""
+    return ACTION_TENSOR
@@ -3,7 +3,11 @@ Integration Tests for SenseForge
 Testing complete workflows end-to-end.
 """
 import pytest
+import pytest_asyncio
 import asyncio
+import numpy as np
+import torch
+import uuid
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
@@ -14,21 +18,30 @@ from model.letta_memory import LettaMemory
 from planning.strategist import StrategistAgent
 from planning.auditor import AuditorAgent
 
+@pytest.mark.xdist_group(name="jepa_training")
+@pytest.mark.usefixtures("isolate_training_files")
 class TestTriAgentWorkflow:
     """Integration tests for full Tri-Agent pipeline"""
     
-    @pytest.fixture
+    @pytest_asyncio.fixture(scope="module", loop_scope="module")
     async def components(self):
-        """Set up all components"""
+        """Set up all components once for the module's tests"""
         analyst = AnalystAgent(mode="mock")
         jepa = LiquidityJEPA(state_dim=3, action_dim=1, latent_dim=16)
-        memory = LettaMemory(agent_id="test-agent", mode="mock")
+        memory = LettaMemory(agent_id=f"test-agent-{uuid.uuid4().hex[:8]}", mode="mock")
         strategist = StrategistAgent(mode="mock")
         auditor = AuditorAgent()
         
+        # Traced inference path; shares jepa's weights, so training still shows
+        with torch.no_grad():
+            traced = torch.jit.trace_module(
+                jepa, {'predict_next_state': (torch.zeros(1, 3), torch.zeros(1, 1))}
+            )
+        
         yield {
             'analyst': analyst,
             'jepa': jepa,
+            'jepa_predict': traced.predict_next_state,
             'memory': memory,
             'strategist': strategist,
             'auditor': auditor
@@ -39,20 +52,22 @@ class TestTriAgentWorkflow:
         await memory.close()
         await strategist.cleanup()
     
-    @pytest.mark.asyncio
-    async def test_full_risk_analysis_workflow(self, components):
+    @pytest.fixture(autouse=True)
+    def reset_jepa(self, components):
+        """Clear mutable training state so each test starts fresh"""
+        components['jepa'].replay_buffer.buffer.clear()
+        components['jepa'].training_history.clear()
+    
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_full_risk_analysis_workflow(self, components, mock_events, action_tensor):
         """Test complete workflow: Analyst -> JEPA -> Strategist -> Auditor"""
         analyst = components['analyst']
-        jepa = components['jepa']
+        jepa_predict = components['jepa_predict']
         strategist = components['strategist']
         auditor = components['auditor']
         
-        # 1. Analyst: Gather events
-        events = []
-        async for event in analyst.stream_liquidity_events():
-            events.append(event)
-            if len(events) >= 3:
-                break
+        # 1. Analyst: Events from the shared mock stream capture
+        events = mock_events[:3]
         
         assert len(events) == 3
         
@@ -61,15 +76,14 @@ class TestTriAgentWorkflow:
         assert state.liquidity_depth > 0
         
         # 3. JEPA: Predict
-        import torch
         state_tensor = torch.tensor([[
             state.liquidity_depth,
             state.volatility_index,
             state.governance_risk_score
         ]])
-        action_tensor = torch.tensor([[1.0]])
         
-        predicted_state = jepa.predict_next_state(state_tensor, action_tensor)
+        with torch.inference_mode():
+            predicted_state = jepa_predict(state_tensor, action_tensor)
         predicted_liquidity = float(predicted_state[0][0])
         
         # 4. Strategist: Analyze risk
@@ -83,7 +97,7 @@ class TestTriAgentWorkflow:
         assert 'approved' in audit
         assert isinstance(audit['approved'], bool)
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_memory_storage_retrieval(self, components):
         """Test memory stores and retrieves episodes"""
         memory = components['memory']
@@ -103,31 +117,24 @@ class TestTriAgentWorkflow:
         # In mock mode, should return what we stored
         assert len(similar) >= 0  # May be empty in mock mode initially
     
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_training_improves_predictions(self, components):
         """Test that JEPA training reduces loss"""
         jepa = components['jepa']
         
         # Add training data
-        for i in range(50):
-            state_dict = {
-                'liquidity_depth': 10000000.0 + i * 10000,
-                'volatility_index': 0.5,
-                'governance_risk_score': 0.3
-            }
-            next_state_dict = {
-                'liquidity_depth': 9500000.0 + i * 10000,
-                'volatility_index': 0.6,
-                'governance_risk_score': 0.4
-            }
-            jepa.add_experience(state_dict, 1.0, next_state_dict)
-        
-        # Train multiple epochs
+        offsets = np.arange(50) * 10000
+        states = np.column_stack([10000000.0 + offsets, np.full(50, 0.5), np.full(50, 0.3)])
+        next_states = np.column_stack([9500000.0 + offsets, np.full(50, 0.6), np.full(50, 0.4)])
+        jepa.add_experiences_batch(states, np.ones(50), next_states)
+        
+        # Train just enough epochs for the comparison below
         losses = []
-        for epoch in range(5):
-            loss = jepa.train_epoch(batch_size=10, num_batches=2)
-            if loss is not None:
-                losses.append(loss)
+        for epoch in range(3):
+            loss = jepa.train_epoch(batch_size=10, num_batches=1)
+            if loss is None:
+                break  # Not enough samples; later epochs would skip too
+            losses.append(loss)
         
         # Loss should generally decrease
         if len(losses) >= 3:
@@ -148,6 +155,17 @@ class TestErrorRecovery:
         
         await analyst.cleanup()
     
+    @pytest.mark.asyncio
+    async def test_analyst_get_events_respects_timeout(self):
+        """Test get_events returns the partial batch on timeout"""
+        analyst = AnalystAgent(mode="mock")
+        
+        # Mock stream yields immediately, then every 2s
+        events = await analyst.get_events(5, timeout=0.5)
+        assert len(events) == 1
+        
+        await analyst.cleanup()
+    
     @pytest.mark.asyncio
     async def test_strategist_fallback(self):
         """Test strategist falls back to rules when LLM fails"""
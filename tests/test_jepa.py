@@ -3,9 +3,8 @@ Unit tests for JEPA Model
 Enterprise-grade testing with fixtures and assertions.
 """
 import pytest
+import numpy as np
 import torch
-import tempfile
-import os
 from pathlib import Path
 
 import sys
@@ -57,31 +56,49 @@ class TestExperienceReplayBuffer:
         
         assert len(buffer) == 5  # Should not exceed capacity
 
+# Training goes through the global metrics tracker and TrainingRepository;
+# keep every test that trains on one xdist worker
+@pytest.mark.xdist_group(name="jepa_training")
+@pytest.mark.usefixtures("isolate_training_files")
 class TestLiquidityJEPA:
     """Test suite for LiquidityJEPA model"""
     
-    @pytest.fixture
+    @pytest.fixture(scope="module")
     def model(self):
-        """Create a test model instance"""
+        """Create one model instance shared by the module's tests"""
         return LiquidityJEPA(state_dim=3, action_dim=1, latent_dim=16)
     
+    @pytest.fixture(scope="module")
+    def traced_model(self, model):
+        """Inference paths of the shared model, traced once (shares its weights)"""
+        with torch.no_grad():
+            return torch.jit.trace_module(model, {
+                'forward': torch.zeros(1, 3),
+                'predict_next_state': (torch.zeros(1, 3), torch.zeros(1, 1)),
+            })
+    
+    @pytest.fixture(autouse=True)
+    def reset_model(self, model):
+        """Clear mutable training state so each test starts fresh"""
+        model.replay_buffer.buffer.clear()
+        model.training_history.clear()
+    
     def test_initialization(self, model):
         """Test model initialization"""
         assert model is not None
         assert len(model.training_history) == 0
         assert len(model.replay_buffer) == 0
     
-    def test_forward_pass(self, model):
+    def test_forward_pass(self, traced_model, state_tensor):
         """Test forward pass through encoder"""
-        state = torch.tensor([[10000000.0, 0.5, 0.3]])
-        latent = model.forward(state)
+        with torch.inference_mode():
+            latent = traced_model(state_tensor)
         assert latent.shape == (1, 16)
     
-    def test_prediction(self, model):
+    def test_prediction(self, traced_model, state_tensor, action_tensor):
         """Test state prediction"""
-        state = torch.tensor([[10000000.0, 0.5, 0.3]])
-        action = torch.tensor([[1.0]])
-        predicted = model.predict_next_state(state, action)
+        with torch.inference_mode():
+            predicted = traced_model.predict_next_state(state_tensor, action_tensor)
         assert predicted.shape == (1, 3)
     
     def test_add_experience(self, model):
@@ -103,18 +120,11 @@ class TestLiquidityJEPA:
     def test_train_epoch(self, model):
         """Test training epoch"""
         # Add enough samples
-        for i in range(50):
-            state_dict = {
-                'liquidity_depth': 10000000.0 + i * 1000,
-                'volatility_index': 0.5,
-                'governance_risk_score': 0.3
-            }
-            next_state_dict = {
-                'liquidity_depth': 9500000.0 + i * 1000,
-                'volatility_index': 0.6,
-                'governance_risk_score': 0.4
-            }
-            model.add_experience(state_dict, 1.0, next_state_dict)
+        offsets = np.arange(50) * 1000
+        states = np.column_stack([10000000.0 + offsets, np.full(50, 0.5), np.full(50, 0.3)])
+        next_states = np.column_stack([9500000.0 + offsets, np.full(50, 0.6), np.full(50, 0.4)])
+        model.add_experiences_batch(states, np.ones(50), next_states)
+        assert len(model.replay_buffer) == 50
         
         # Train
         loss = model.train_epoch(batch_size=10, num_batches=2)
@@ -122,23 +132,24 @@ class TestLiquidityJEPA:
         assert loss > 0
         assert len(model.training_history) == 1
     
-    def test_checkpoint_save_load(self, model):
+    def test_checkpoint_save_load(self, tmp_path):
         """Test checkpoint save and load"""
-        with tempfile.TemporaryDirectory() as tmpdir:
-            checkpoint_path = os.path.join(tmpdir, 'test_checkpoint.pth')
-            
-            # Add training history
-            model.training_history = [0.5, 0.4, 0.3]
-            
-            # Save
-            model.save_checkpoint(checkpoint_path)
-            assert os.path.exists(checkpoint_path)
-            
-            # Load in new model
-            new_model = LiquidityJEPA(state_dim=3, action_dim=1, latent_dim=16)
-            loaded = new_model.load_checkpoint(checkpoint_path)
-            assert loaded
-            assert new_model.training_history == [0.5, 0.4, 0.3]
+        # Small standalone model keeps the checkpoint file tiny
+        small_model = LiquidityJEPA(state_dim=3, action_dim=1, latent_dim=4)
+        checkpoint_path = tmp_path / "ckpt.pth"
+        
+        # Add training history
+        small_model.training_history = [0.5, 0.4, 0.3]
+        
+        # Save
+        small_model.save_checkpoint(str(checkpoint_path))
+        assert checkpoint_path.exists()
+        
+        # Load in new model
+        new_model = LiquidityJEPA(state_dim=3, action_dim=1, latent_dim=4)
+        loaded = new_model.load_checkpoint(str(checkpoint_path))
+        assert loaded
+        assert new_model.training_history == [0.5, 0.4, 0.3]
     
     def test_training_stats(self, model):
         """Test training statistics calculation"""
@@ -0,0 +1,58 @@
+"""
+Unit tests for Metrics Tracking
+Testing the cached dashboard snapshot.
+"""
+import pytest
+import orjson
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from metrics import MetricsTracker
+
+@pytest.fixture
+def tracker(tmp_path):
+    """Tracker persisting to a throwaway file"""
+    return MetricsTracker(metrics_file=str(tmp_path / "metrics.json"))
+
+class TestDashboardSnapshot:
+    """Test suite for MetricsTracker.get_snapshot_bytes"""
+    
+    def test_save_invalidates_cached_snapshot(self, tracker):
+        """Test the snapshot is rebuilt after save_metrics"""
+        assert orjson.loads(tracker.get_snapshot_bytes())['recent_predictions'] == []
+        
+        tracker.predictions.append({'timestamp': 't', 'predicted': 0.4, 'actual': None, 'metadata': {}})
+        tracker.save_metrics()
+        snapshot = orjson.loads(tracker.get_snapshot_bytes())
+        assert [p['predicted'] for p in snapshot['recent_predictions']] == [0.4]
+    
+    def test_timestamp_is_fresh_on_every_call(self, tracker, monkeypatch):
+        """Test a cached snapshot still reports the current time"""
+        tracker.track_training(1.0)
+        
+        monkeypatch.setattr("metrics.utc_now_iso", lambda: "2030-01-01T00:00:00Z")
+        first = orjson.loads(tracker.get_snapshot_bytes())
+        monkeypatch.setattr("metrics.utc_now_iso", lambda: "2030-01-01T00:00:07Z")
+        second = orjson.loads(tracker.get_snapshot_bytes())
+        
+        assert first['timestamp'] == "2030-01-01T00:00:00Z"
+        assert second['timestamp'] == "2030-01-01T00:00:07Z"
+        assert first['training'] == second['training']
+        assert second['training']['epochs'] == 1
+
+    def test_snapshot_matches_direct_serialization(self, tracker):
+        """Test the hand-assembled body is the same object dumps() would build"""
+        tracker.track_training(1.0)
+        tracker.track_training(0.5)
+        
+        snapshot = orjson.loads(tracker.get_snapshot_bytes(recent_limit=5))
+        
+        assert list(snapshot) == ['accuracy', 'training', 'recent_predictions', 'timestamp']
+        assert snapshot['accuracy'] == tracker.get_accuracy_stats()
+        assert snapshot['training'] == tracker.get_training_stats()
+        assert snapshot['recent_predictions'] == tracker.get_recent_predictions(limit=5)
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,44 @@
+"""
+Unit tests for the Proof of Reasoning Logger
+Testing chain persistence and the summary report.
+"""
+import pytest
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from reasoning_logger import ProofOfReasoningLogger
+
+@pytest.fixture
+def reasoning(tmp_path):
+    """Logger writing chains to a throwaway directory"""
+    return ProofOfReasoningLogger(output_dir=str(tmp_path))
+
+class TestSummaryReport:
+    """Test suite for ProofOfReasoningLogger.generate_summary_report"""
+    
+    def test_empty_report(self, reasoning):
+        """Test a report with no saved chains"""
+        report = reasoning.generate_summary_report()
+        
+        assert report['count'] == 0
+        assert report['components_used'] == []
+    
+    def test_report_reads_saved_chains(self, reasoning):
+        """Test finalized chains are counted with their steps and durations"""
+        for duration in (10.0, 30.0):
+            reasoning.start_chain("Analyze risk for PROP-123")
+            reasoning.log_step("Analyst", {}, {"events": 5}, "Normalized 5 events")
+            reasoning.log_step("Auditor", {}, {"approved": True}, "Approved")
+            reasoning.finalize_chain({"risk_level": "LOW"}, duration)
+        
+        report = reasoning.generate_summary_report(lookback_hours=1)
+        
+        assert report['count'] == 2
+        assert report['avg_duration_ms'] == pytest.approx(20.0)
+        assert report['avg_steps'] == 2
+        assert report['components_used'] == {"Analyst": 2, "Auditor": 2}
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -4,7 +4,7 @@ Testing circuit breakers, retry logic, and rate limiting.
 """
 import pytest
 import asyncio
-from datetime import datetime
+from datetime import timedelta
 
 import sys
 from pathlib import Path
@@ -12,6 +12,26 @@ sys.path.append(str(Path(__file__).parent.parent))
 
 from resilience import CircuitBreaker, retry_with_backoff, RateLimiter, CircuitState
 
+class VirtualClock:
+    """Injected in place of time.monotonic/asyncio.sleep; sleeping advances the clock instantly"""
+    
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+    
+    def monotonic(self):
+        return self.now
+    
+    async def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+@pytest.fixture
+def clock():
+    """Virtual time for a RateLimiter; the event loop keeps the real clock"""
+    return VirtualClock()
+
+@pytest.mark.xdist_group(name="async_resilience")
 class TestCircuitBreaker:
     """Test suite for CircuitBreaker"""
     
@@ -86,8 +106,8 @@ class TestCircuitBreaker:
             
             assert cb.state == CircuitState.OPEN
             
-            # Wait for recovery timeout
-            await asyncio.sleep(1.1)
+            # Backdate the last failure past the recovery timeout
+            cb.last_failure_time -= timedelta(seconds=1.1)
             
             # Next call should enter HALF_OPEN and succeed
             result = await cb.call(successful_call)
@@ -139,36 +159,25 @@ class TestRetryWithBackoff:
         
         asyncio.run(_test())
 
+@pytest.mark.xdist_group(name="async_resilience")
 class TestRateLimiter:
     """Test suite for RateLimiter"""
     
-    def test_allows_within_rate(self):
-        """Test allows calls within rate limit"""
+    def test_allows_within_rate_and_throttles_above(self, clock):
+        """Test allows calls within rate limit and throttles calls above it"""
         async def _test():
-            limiter = RateLimiter(rate=10, per=1.0)
-            
-            start = datetime.now()
+            # Under the limit: no waiting
+            limiter = RateLimiter(rate=10, per=1.0, clock=clock.monotonic, sleep=clock.sleep)
             for i in range(5):
                 await limiter.acquire()
-            duration = (datetime.now() - start).total_seconds()
+            assert sum(clock.sleeps) < 0.5
             
-            # Should be fast since we're under the limit
-            assert duration < 0.5
-        
-        asyncio.run(_test())
-    
-    def test_throttles_above_rate(self):
-        """Test throttles calls above rate limit"""
-        async def _test():
-            limiter = RateLimiter(rate=2, per=1.0)
-            
-            start = datetime.now()
-            for i in range(4):  # More than rate
+            # Over the limit: should wait at least 1 second (to allow 2 more requests)
+            clock.sleeps.clear()
+            limiter = RateLimiter(rate=2, per=1.0, clock=clock.monotonic, sleep=clock.sleep)
+            for i in range(4):
                 await limiter.acquire()
-            duration = (datetime.now() - start).total_seconds()
-            
-            # Should take at least 1 second (to allow 2 more requests)
-            assert duration >= 0.9
+            assert sum(clock.sleeps) >= 0.9
         
         asyncio.run(_test())
 
@@ -8,10 +8,126 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from security.validation import QueryRequest, SecureResponseBuilder, validate_api_key
-from security.rate_limiter import RateLimiter
+from security import validation
+from security.validation import (
+    QueryRequest, SecureResponseBuilder, SecuritySanitizer, validate_api_key
+)
+from security.rate_limiter import RateLimiter, RateLimitMiddleware, SharedMemoryStore
+from security.auth import APIKeyManager, AuthenticationMiddleware
+from security.headers import SECURITY_HEADERS, SecurityHeadersMiddleware
+from urllib.parse import unquote
 import asyncio
+import json
+import os
+import re
+import time
+import timeit
+import uuid
+from datetime import datetime, timezone
 
+# Distinct rate limit clients, built once rather than per loop iteration
+CLIENT_KEYS = tuple(f"client_{i}" for i in range(5))
+
+# (text, rejected) for the forbidden-pattern scan; every FORBIDDEN_PATTERNS
+# alternative appears at least once, plus non-ASCII look-alikes
+FORBIDDEN_SCAN_CASES = [
+    ("DROP TABLE predictions", True),
+    ("please delete row", True),
+    ("Insert into t", True),
+    ("upDate x", True),
+    ("EXEC sp_who", True),
+    ("1 UNION select", True),
+    ("a -- comment", True),
+    ("a; b", True),
+    ("a || b", True),
+    ("a && b", True),
+    ("$(whoami)", True),
+    ("`id`", True),
+    ("eval(x)", True),
+    ("EXEC(x)", True),
+    ("<SCRIPT>", True),
+    ("<iframe src=x>", True),
+    ("<object>", True),
+    ("<embed>", True),
+    ("img onError=x", True),
+    ("body ONLOAD=x", True),
+    ("../etc/passwd", True),
+    ("..\\windows", True),
+    # Dotless i (U+0131) and dotted capital I (U+0130)
+    ("\u0131nsert into t", True),
+    ("1 un\u0131on select", True),
+    ("<scr\u0131pt>", True),
+    ("\u0130NSERT into t", True),
+    # Fullwidth letters and the long s (U+017F) are folded by NFKC
+    ("\uff24\uff32\uff2f\uff30 table", True),
+    ("<\u017fcript>", True),
+    # ASCII \b: a keyword glued to a non-ASCII letter is still a keyword
+    ("caf\u00e9DROP table", True),
+    ("Analyze risk for PROP-123", False),
+    ("dropdown updates reunion", False),
+    ("na\u00efve caf\u00e9 \u0130stanbul", False),
+    ("\u0131ns\u0131ght", False),
+    ("risk is 5-10%", False),
+]
+
+# (raw request path, exempt from auth and rate limiting); raw paths are
+# sent as-is, since HTTP clients would normalize the dot segment away
+PATH_EXEMPTIONS = [
+    (b"/health", True),
+    (b"/health?x=1", True),
+    (b"/metrics", True),
+    (b"/.well-known/agent.json", True),
+    (b"/healthz", False),
+    (b"/health/../query", False),
+    (b"/%68ealth", False),
+    (b"/query", False),
+]
+
+async def ok_app(scope, receive, send):
+    """Innermost ASGI app: always 200"""
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+def asgi_get(app, raw_path: bytes) -> tuple[int, dict]:
+    """Send one GET with an exact raw path; returns (status, headers)"""
+    path, _, query = raw_path.partition(b"?")
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "root_path": "",
+        "path": unquote(path.decode()), "raw_path": raw_path, "query_string": query,
+        "headers": [], "client": ("203.0.113.7", 50000), "server": ("testserver", 80),
+    }
+    messages = []
+    
+    async def run():
+        requested = False
+        done = asyncio.Event()
+        
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # The client stays connected until the response is complete
+            await done.wait()
+            return {"type": "http.disconnect"}
+        
+        async def send(message):
+            messages.append(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                done.set()
+        
+        await app(scope, receive, send)
+    
+    asyncio.run(run())
+    return messages[0]["status"], dict(messages[0]["headers"])
+
+@pytest.fixture(scope="class")
+def warm_validators():
+    """Build the validators once up front so first-use cost stays out of the tests"""
+    QueryRequest(query="warmup", proposal_id="PROP-1", metadata={"source": "warmup"})
+
+@pytest.mark.usefixtures("warm_validators")
 class TestInputValidation:
     """Test input validation"""
     
@@ -23,76 +139,258 @@ class TestInputValidation:
         )
         assert request.query == "Analyze risk for PROP-123"
     
-    def test_query_sanitization(self):
-        """Test HTML escaping"""
-        # The validation logic now rejects dangerous patterns instead of just escaping them
-        with pytest.raises(ValueError, match="forbidden pattern"):
-            QueryRequest(query="Test <script>alert('xss')</script>")
+    def test_validated_query_is_immutable(self):
+        """Test a validated request cannot be altered after sanitization"""
+        request = QueryRequest(query="Analyze risk for PROP-123")
+        with pytest.raises(ValueError):
+            request.query = "DROP TABLE predictions"
     
-    def test_dangerous_pattern_rejection(self):
-        """Test rejection of dangerous patterns"""
+    @pytest.mark.parametrize("query", [
+        "Test <script>alert('xss')</script>",
+        "DROP TABLE predictions",
+        "eval(malicious_code)",
+    ])
+    def test_dangerous_pattern_rejection(self, query):
+        """Test rejection of dangerous patterns (rejected, not escaped)"""
         with pytest.raises(ValueError, match="forbidden pattern"):
-            QueryRequest(query="DROP TABLE predictions")
+            QueryRequest(query=query)
+    
+    @pytest.mark.parametrize("query", [
+        "\u0131nsert into t",
+        "1 un\u0131on select",
+        "<scr\u0131pt>",
+    ])
+    def test_regex_fallback_folds_dotless_i(self, query, monkeypatch):
+        """Test the re fallback rejects keywords spelled with U+0131, like IGNORECASE does"""
+        monkeypatch.setattr("security.validation._FORBIDDEN_DB", None)
         
         with pytest.raises(ValueError, match="forbidden pattern"):
-            QueryRequest(query="eval(malicious_code)")
+            QueryRequest(query=query)
+    
+    @pytest.mark.parametrize("backend", ["hyperscan", "re"])
+    @pytest.mark.parametrize("text, rejected", FORBIDDEN_SCAN_CASES)
+    def test_scan_backends_agree(self, backend, text, rejected, monkeypatch):
+        """Test the Hyperscan and re fallback scans reject exactly the same inputs"""
+        if backend == "hyperscan" and validation._FORBIDDEN_DB is None:
+            pytest.skip("hyperscan not installed")
+        if backend == "re":
+            monkeypatch.setattr(validation, "_FORBIDDEN_DB", None)
+        
+        if rejected:
+            with pytest.raises(ValueError, match="forbidden pattern"):
+                SecuritySanitizer.sanitize_text(text)
+        else:
+            SecuritySanitizer.sanitize_text(text)
+    
+    def test_fallback_rules_follow_forbidden_patterns(self):
+        """Test the re fallback rules are derived from any FORBIDDEN_PATTERNS layout"""
+        literals, regex = validation._split_forbidden_patterns([
+            r'(<Script|\.\./|\$\()',
+            r'(\bDROP\b|wget\s+http)',
+            r'(?:EVAL|x)',
+        ])
+        
+        assert literals == ('<script', '../', '$(')
+        assert regex == r'\bdrop\b|wget\s+http|((?:eval|x))'
     
-    def test_proposal_id_format(self):
+    @pytest.mark.parametrize("proposal_id, valid", [
+        ("PROP-123", True),
+        ("invalid-format", False),
+        ("PROP-123\n", False),
+    ])
+    def test_proposal_id_format(self, proposal_id, valid):
         """Test proposal ID format validation"""
-        # Valid
-        request = QueryRequest(query="test", proposal_id="PROP-123")
-        assert request.proposal_id == "PROP-123"
+        if valid:
+            request = QueryRequest(query="test", proposal_id=proposal_id)
+            assert request.proposal_id == proposal_id
+        else:
+            with pytest.raises(ValueError):
+                QueryRequest(query="test", proposal_id=proposal_id)
+    
+    @pytest.mark.timing
+    def test_patterns_resist_backtracking_attacks(self):
+        """Test sanitizer regexes stay linear on adversarial input"""
+        attacks = [
+            'a' * 10000 + 'X',
+            '>' + '<' * 100000,
+            ',' + 'data:' * 20000,
+        ]
         
-        # Invalid
-        with pytest.raises(ValueError):
-            QueryRequest(query="test", proposal_id="invalid-format")
+        start = time.perf_counter()
+        for attack in attacks:
+            for pattern in SecuritySanitizer.FORBIDDEN_PATTERNS:
+                compiled = re.compile(pattern, re.IGNORECASE)
+                compiled.fullmatch(attack)
+                compiled.search(attack)
+            SecuritySanitizer.sanitize_html(attack)
+        SecuritySanitizer.sanitize_text(',' + 'data:' * 1999)
+        
+        assert time.perf_counter() - start < 0.5
     
-    def test_metadata_size_limit(self):
-        """Test metadata size limits"""
-        large_metadata = {"key": "x" * 20000}
+    def test_nested_metadata_scrubbed_in_place(self):
+        """Test nested dict values and list items come back escaped, in their positions"""
+        metadata = {
+            "source": "web",
+            "outer": {"note": "<b>x</b> onclick=y", "depth": {"n": 1, "s": "a&b"}},
+            "tags": ["plain", "<i>a</i>", 3, "ONCLICK=z"],
+        }
+        
+        request = QueryRequest(query="test", metadata=metadata)
         
-        with pytest.raises(ValueError, match="exceeds maximum length"):
-            QueryRequest(query="test", metadata=large_metadata)
+        assert request.metadata == {
+            "source": "web",
+            "outer": {"note": "&lt;b&gt;x&lt;/b&gt; =y", "depth": {"n": 1, "s": "a&amp;b"}},
+            "tags": ["plain", "&lt;i&gt;a&lt;/i&gt;", 3, "=z"],
+        }
+        # The caller's dict is left untouched
+        assert metadata["tags"][1] == "<i>a</i>"
+        assert metadata["outer"]["note"] == "<b>x</b> onclick=y"
     
-    def test_forbidden_metadata_keys(self):
-        """Test forbidden keys in metadata"""
-        with pytest.raises(ValueError, match="cannot contain key"):
-            QueryRequest(query="test", metadata={"password": "secret"})
+    @pytest.mark.parametrize("metadata, match", [
+        ({"key": "x" * 20000}, "exceeds maximum length"),
+        # Size limit covers nested values, not just the top-level dict
+        ({"items": ["x" * 900] * 20}, r"Metadata size exceeds limit \(10KB\)"),
+        ({"password": "secret"}, "cannot contain key"),
+        # Forbidden keys match as substrings, at any depth
+        ({"user": {"Api_Key_Id": "abc"}}, "cannot contain key"),
+        # Forbidden patterns are rejected in nested values and list items too
+        ({"outer": {"note": "<script>alert(1)</script>"}}, "forbidden pattern"),
+        ({"tags": ["ok", "<script>"]}, "forbidden pattern"),
+    ])
+    def test_metadata_rejection(self, metadata, match):
+        """Test oversized metadata and forbidden metadata keys are rejected"""
+        with pytest.raises(ValueError, match=match):
+            QueryRequest(query="test", metadata=metadata)
 
 class TestRateLimiting:
     """Test rate limiting"""
     
-    def test_allows_within_limit(self):
+    @pytest.mark.asyncio
+    async def test_allows_within_limit(self):
         """Test allows requests within limit"""
-        async def _test():
-            limiter = RateLimiter(rate=10, per=1.0, storage='memory')
-            
-            for i in range(5):
-                allowed, info = await limiter.is_allowed(f"client_{i}")
-                assert allowed
-                assert info['remaining'] >= 0
+        limiter = RateLimiter(rate=10, per=1.0, storage='memory')
         
-        asyncio.run(_test())
+        for client_key in CLIENT_KEYS:
+            allowed, info = await limiter.is_allowed(client_key)
+            assert allowed
+            assert info['remaining'] >= 0
     
-    def test_blocks_over_limit(self):
+    @pytest.mark.asyncio
+    async def test_blocks_over_limit(self):
         """Test blocks requests over limit"""
-        async def _test():
-            limiter = RateLimiter(rate=2, per=1.0, storage='memory')
-            
-            client_key = "test_client"
-            
-            # First 2 should pass
-            for i in range(2):
-                allowed, _ = await limiter.is_allowed(client_key)
-                assert allowed
+        limiter = RateLimiter(rate=2, per=1.0, storage='memory')
+        
+        client_key = "test_client"
+        
+        # First 2 should pass
+        for i in range(2):
+            allowed, _ = await limiter.is_allowed(client_key)
+            assert allowed
+        
+        # 3rd should be blocked
+        allowed, info = await limiter.is_allowed(client_key)
+        assert not allowed
+        assert info['remaining'] == 0
+        assert 'retry_after' in info
+    
+    def test_shared_memory_limit_is_global(self):
+        """Test workers attached to one segment share the same buckets"""
+        name = f"sf_test_{uuid.uuid4().hex[:8]}"
+        worker_a = SharedMemoryStore(name=name, slots=64)
+        worker_b = SharedMemoryStore(name=name, slots=64)
+        
+        try:
+            now = 1000.0
+            assert worker_a.consume("test_client", 2, 2.0, now)[0]
+            assert worker_b.consume("test_client", 2, 2.0, now)[0]
             
-            # 3rd should be blocked
-            allowed, info = await limiter.is_allowed(client_key)
+            # Budget is exhausted for both workers
+            allowed, tokens = worker_a.consume("test_client", 2, 2.0, now)
             assert not allowed
-            assert info['remaining'] == 0
-            assert 'retry_after' in info
+            assert tokens < 1.0
             
-        asyncio.run(_test())
+            # Refills after the period
+            assert worker_b.consume("test_client", 2, 2.0, now + 1.0)[0]
+        finally:
+            worker_b.close()
+            worker_a.close(unlink=True)
+    
+    def test_shared_memory_clock_skew_never_drains(self):
+        """Test a worker reading a newer timestamp than its own clock takes no extra tokens"""
+        name = f"sf_test_{uuid.uuid4().hex[:8]}"
+        worker_a = SharedMemoryStore(name=name, slots=64)
+        worker_b = SharedMemoryStore(name=name, slots=64)
+        
+        try:
+            assert worker_a.consume("test_client", 5, 1.0, 1000.0) == (True, 4.0)
+            # worker_b's clock is 2s behind: only its one token is spent
+            assert worker_b.consume("test_client", 5, 1.0, 998.0) == (True, 3.0)
+        finally:
+            worker_b.close()
+            worker_a.close(unlink=True)
+
+class TestRedisRateLimiting:
+    """Test the Redis token bucket script (needs fakeredis with Lua support)"""
+    
+    @pytest.fixture
+    def redis_server(self):
+        """In-process Redis server shared by every client made from it"""
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        return fakeredis.FakeServer()
+    
+    def make_limiter(self, redis_server, rate=2, per=10.0):
+        """A limiter as one worker process would build it"""
+        import fakeredis
+        client = fakeredis.FakeAsyncRedis(server=redis_server)
+        return RateLimiter(rate=rate, per=per, storage='redis', redis_client=client)
+    
+    @pytest.mark.asyncio
+    async def test_allows_then_denies(self, redis_server):
+        """Test the bucket admits 'rate' requests, then denies with retry_after"""
+        limiter = self.make_limiter(redis_server)
+        
+        allowed, info = await limiter.is_allowed("test_client")
+        assert allowed and info['remaining'] == 1
+        allowed, info = await limiter.is_allowed("test_client")
+        assert allowed and info['remaining'] == 0
+        
+        allowed, info = await limiter.is_allowed("test_client")
+        assert not allowed
+        assert info['remaining'] == 0
+        # One token refills in per / rate = 5s (less the time already elapsed)
+        assert info['retry_after'] in (4, 5)
+    
+    @pytest.mark.asyncio
+    async def test_bucket_refills_and_expires(self, redis_server):
+        """Test refill math at explicit times, and expiry once the bucket is full again"""
+        limiter = self.make_limiter(redis_server)
+        key = [b"ratelimit:refill"]
+        
+        async def consume(now):
+            allowed, tokens = await limiter._token_bucket(
+                keys=key, args=[now, 2, 0.2, limiter._bucket_ttl_ms]
+            )
+            return int(allowed), float(tokens)
+        
+        assert await consume(100.0) == (1, 1.0)
+        assert await consume(100.0) == (1, 0.0)
+        assert await consume(102.0) == (0, 0.4)
+        assert await consume(105.0) == (1, 0.0)
+        
+        ttl = await limiter.redis_client.pttl(key[0])
+        assert 10000 < ttl <= 11000
+    
+    @pytest.mark.asyncio
+    async def test_workers_share_one_bucket(self, redis_server):
+        """Test concurrent checks from several workers never over-admit"""
+        workers = [self.make_limiter(redis_server, rate=5) for _ in range(3)]
+        
+        results = await asyncio.gather(*(
+            worker.is_allowed("shared_client") for worker in workers for _ in range(10)
+        ))
+        
+        assert sum(allowed for allowed, _ in results) == 5
 
 class TestAPIKeyValidation:
     """Test API key validation"""
@@ -107,24 +405,101 @@ class TestAPIKeyValidation:
         valid_keys = ['test-key-123456789']
         assert not validate_api_key('wrong-key', valid_keys)
     
+    def test_key_file_reload(self, tmp_path):
+        """Test a rewritten keys file replaces the old keys on reload"""
+        keys_file = tmp_path / "api_keys.json"
+        keys_file.write_text(json.dumps({"keys": ["old-key-123456789"]}))
+        manager = APIKeyManager(str(keys_file))
+        assert manager.validate_key("old-key-123456789")
+        assert not manager.reload_if_changed()
+        
+        keys_file.write_text(json.dumps({"keys": ["new-key-123456789"]}))
+        # Coarse filesystem clocks can leave the mtime unchanged; bump it
+        mtime = manager._keys_mtime + 1_000_000_000
+        os.utime(keys_file, ns=(mtime, mtime))
+        
+        assert manager.reload_if_changed()
+        assert not manager.validate_key("old-key-123456789")
+        assert manager.validate_key("new-key-123456789")
+    
+    @pytest.mark.asyncio
+    async def test_background_reload_stops_cleanly(self, tmp_path):
+        """Test the reload poll picks up new keys and is cancelled on stop"""
+        keys_file = tmp_path / "api_keys.json"
+        keys_file.write_text(json.dumps({"keys": ["old-key-123456789"]}))
+        manager = APIKeyManager(str(keys_file))
+        
+        manager.start_reloading(interval=0.01)
+        task = manager._reload_task
+        keys_file.write_text(json.dumps({"keys": ["new-key-123456789"]}))
+        mtime = manager._keys_mtime + 1_000_000_000
+        os.utime(keys_file, ns=(mtime, mtime))
+        for _ in range(100):
+            if manager.validate_key("new-key-123456789"):
+                break
+            await asyncio.sleep(0.01)
+        await manager.stop_reloading()
+        
+        assert manager.validate_key("new-key-123456789")
+        assert task.cancelled()
+        assert manager._reload_task is None
+    
+    @pytest.mark.timing
     def test_constant_time_comparison(self):
         """Test timing attack resistance"""
-        import time
-        
         valid_keys = ['a' * 32]
         
-        # Time comparison with matching prefix
-        start = time.perf_counter()
-        validate_api_key('a' * 31 + 'b', valid_keys)
-        time_wrong = time.perf_counter() - start
+        # Best of 5 runs of 500 calls each; the minimum filters out scheduler noise
+        # Comparison with matching prefix
+        time_wrong = min(timeit.repeat(
+            lambda: validate_api_key('a' * 31 + 'b', valid_keys), number=500, repeat=5
+        ))
         
-        # Time comparison with no match
-        start = time.perf_counter()
-        validate_api_key('b' * 32, valid_keys)
-        time_different = time.perf_counter() - start
+        # Comparison with no match
+        time_different = min(timeit.repeat(
+            lambda: validate_api_key('b' * 32, valid_keys), number=500, repeat=5
+        ))
         
         # Times should be similar (constant time)
-        assert abs(time_wrong - time_different) < 0.001  # 1ms tolerance
+        assert abs(time_wrong - time_different) / max(time_wrong, time_different) < 0.2
+
+class TestSecurityHeaders:
+    """Test security headers middleware"""
+    
+    def test_headers_added_once(self):
+        """Test every header is present exactly once, even if the handler set one"""
+        from starlette.applications import Starlette
+        from starlette.responses import PlainTextResponse
+        from starlette.routing import Route
+        from starlette.testclient import TestClient
+        
+        async def handler(request):
+            return PlainTextResponse("ok", headers={"X-Frame-Options": "SAMEORIGIN"})
+        
+        app = SecurityHeadersMiddleware(Starlette(routes=[Route("/", handler)]))
+        response = TestClient(app).get("/")
+        
+        for name, value in SECURITY_HEADERS.items():
+            assert response.headers.get_list(name) == [value]
+
+class TestPathExemptions:
+    """Test which raw paths bypass authentication and rate limiting"""
+    
+    @pytest.mark.parametrize("raw_path, exempt", PATH_EXEMPTIONS)
+    def test_auth_exemption(self, raw_path, exempt):
+        """Test only the public endpoints are served without an API key"""
+        status, _ = asgi_get(AuthenticationMiddleware(ok_app), raw_path)
+        
+        assert status == (200 if exempt else 401)
+    
+    @pytest.mark.parametrize("raw_path, exempt", PATH_EXEMPTIONS)
+    def test_rate_limit_exemption(self, raw_path, exempt):
+        """Test only the public endpoints skip the rate limiter"""
+        middleware = RateLimitMiddleware(ok_app, rate_limiter=RateLimiter(rate=5, per=60))
+        status, headers = asgi_get(middleware, raw_path)
+        
+        assert status == 200
+        assert (b"x-ratelimit-limit" in headers) is not exempt
 
 class TestSecureResponses:
     """Test secure response building"""
@@ -141,6 +516,24 @@ class TestSecureResponses:
         assert 'timestamp' in response
         assert response['data'] == {"result": "test"}
     
+    def test_success_response_encodes_rich_types(self):
+        """Test datetimes, UUIDs and tuples in the payload survive dumps()"""
+        when = datetime(2030, 1, 1, 12, 0, tzinfo=timezone.utc)
+        request_uuid = uuid.UUID(int=1)
+        response = SecureResponseBuilder.success_response(
+            {"when": when, "id": request_uuid, "pair": (1, 2)},
+            "req-123"
+        )
+        
+        # Passed through untouched; encoding is dumps()'s job
+        assert response['data']['when'] is when
+        decoded = json.loads(SecureResponseBuilder.dumps(response))
+        assert decoded['data'] == {
+            "when": "2030-01-01T12:00:00Z",
+            "id": "00000000-0000-0000-0000-000000000001",
+            "pair": [1, 2]
+        }
+    
     def test_error_response_hides_details(self):
         """Test error details are hidden in production"""
         response = SecureResponseBuilder.error_response(
@@ -166,9 +559,19 @@ class TestSecureResponses:
         
         assert response['message'] == "Detailed error message"
         assert response['details'] == {"stack": "debug info"}
+    
+    def test_dumps_serializes_numpy_and_datetimes(self):
+        """Test response bytes cover the numpy and datetime values models emit"""
+        import numpy as np
+        from datetime import datetime, timezone
+        
+        raw = SecureResponseBuilder.dumps({
+            "risk": np.float32(0.5),
+            "state": np.arange(6, dtype=np.float64)[::2],
+            "at": datetime(2024, 1, 1, tzinfo=timezone.utc),
+        })
+        
+        assert raw == b'{"risk":0.5,"state":[0.0,2.0,4.0],"at":"2024-01-01T00:00:00Z"}'
 
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
-
-
-
@@ -0,0 +1,223 @@
+"""
+Unit tests for the A2A Server
+Testing the HTTP routes against mock-mode components.
+"""
+import pytest
+import orjson
+from starlette.responses import Response
+from starlette.testclient import TestClient
+
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import server
+from perception.analyst import AnalystAgent
+from model.jepa import LiquidityJEPA
+from planning.strategist import StrategistAgent
+from planning.auditor import AuditorAgent
+
+QUERY = {"query": "Analyze risk for PROP-123"}
+
+@pytest.fixture
+def client():
+    """Client without the lifespan: tests install the components they need"""
+    return TestClient(server.app)
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    """Mock-mode pipeline components in place of initialize_components"""
+    # Reasoning chains are written per query; keep them out of data/
+    monkeypatch.setattr(server.reasoning_logger, "output_dir", tmp_path)
+    jepa = LiquidityJEPA(state_dim=3, action_dim=1, latent_dim=16)
+    jepa.eval()
+    monkeypatch.setattr(server, "analyst", AnalystAgent(mode="mock", mock_interval=0))
+    monkeypatch.setattr(server, "jepa", jepa)
+    monkeypatch.setattr(server, "jepa_predict", jepa.predict_next_state)
+    monkeypatch.setattr(server, "strategist", StrategistAgent(mode="mock"))
+    monkeypatch.setattr(server, "auditor", AuditorAgent())
+    return server
+
+def read_events(response):
+    """Parse a text/event-stream body into [(event, data)]"""
+    events = []
+    for block in response.text.split("\n\n"):
+        if not block:
+            continue
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields["event"], orjson.loads(fields["data"])))
+    return events
+
+class TestQueryStream:
+    """Test suite for POST /query/stream"""
+
+    def test_step_events_then_done(self, client, pipeline):
+        """Test one step event per component, in pipeline order, then done"""
+        response = client.post("/query/stream", json=QUERY, headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        # EventStreamGZipMiddleware leaves the stream uncompressed
+        assert "content-encoding" not in response.headers
+
+        events = read_events(response)
+        assert [event for event, _ in events] == ["step"] * 4 + ["done"]
+        assert [data["component"] for _, data in events[:4]] == [
+            "Analyst", "Brain (JEPA)", "Strategist", "Auditor"
+        ]
+        done = events[-1][1]
+        assert done["status"] == "success"
+        assert done["request_id"] == response.headers["x-request-id"]
+        assert "risk_assessment" in done["data"]["analysis"]
+
+    def test_failure_is_reported_in_band(self, client, pipeline, monkeypatch):
+        """Test a component failing after the headers are sent yields an error event"""
+        async def fail(strategy):
+            raise RuntimeError("auditor offline")
+        monkeypatch.setattr(pipeline.auditor, "validate_action", fail)
+
+        response = client.post("/query/stream", json=QUERY)
+
+        assert response.status_code == 200
+        events = read_events(response)
+        assert [event for event, _ in events] == ["step"] * 3 + ["error"]
+        assert events[-1][1]["error_type"] == "internal_error"
+
+    def test_invalid_query_rejected_before_streaming(self, client, pipeline):
+        """Test validation errors are a plain 400, not an event stream"""
+        response = client.post("/query/stream", json={"query": "DROP TABLE users"})
+
+        assert response.status_code == 400
+        assert response.headers["content-type"] == "application/json"
+        assert response.json()["error_type"] == "validation_error"
+
+class TestEventStreamGZip:
+    """Test suite for EventStreamGZipMiddleware"""
+
+    BODY = b"data: " + b"x" * 8192 + b"\n\n"
+
+    @pytest.fixture
+    def gzip_client(self):
+        async def app(scope, receive, send):
+            media_type = "text/event-stream" if scope["path"] == "/events" else "text/plain"
+            await Response(self.BODY, media_type=media_type)(scope, receive, send)
+        return TestClient(server.EventStreamGZipMiddleware(app, minimum_size=500))
+
+    def test_large_bodies_still_compressed(self, gzip_client):
+        """Test ordinary responses are gzipped as before"""
+        response = gzip_client.get("/plain", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.content == self.BODY
+
+    def test_event_stream_passed_through(self, gzip_client):
+        """Test text/event-stream is sent as-is, with no Content-Encoding"""
+        response = gzip_client.get("/events", headers={"Accept-Encoding": "gzip"})
+
+        assert "content-encoding" not in response.headers
+        assert response.headers["content-length"] == str(len(self.BODY))
+        assert response.content == self.BODY
+
+class TestHealthCache:
+    """Test suite for the /health component probe cache"""
+
+    @pytest.fixture
+    def probes(self, monkeypatch):
+        """Count _check_components calls under a fake clock; returns (calls, clock)"""
+        calls = []
+        clock = [1000.0]
+
+        async def check_components():
+            calls.append(clock[0])
+            return {'analyst': 'healthy'}, 'healthy', 200
+
+        monkeypatch.setattr(server, "_check_components", check_components)
+        monkeypatch.setattr(server, "_health_clock", lambda: clock[0])
+        monkeypatch.setattr(server, "_health_cache", {'ts': 0.0, 'result': None})
+        return calls, clock
+
+    def test_probe_reused_within_ttl(self, client, probes):
+        """Test repeated /health calls inside HEALTH_CACHE_TTL probe once"""
+        calls, clock = probes
+
+        for offset in (0.0, 1.0, server.HEALTH_CACHE_TTL - 0.01):
+            clock[0] = 1000.0 + offset
+            response = client.get("/health")
+            assert response.status_code == 200
+            assert response.json()['components'] == {'analyst': 'healthy'}
+
+        assert calls == [1000.0]
+
+    def test_probe_reruns_after_ttl(self, client, probes):
+        """Test the components are probed again once the cache expires"""
+        calls, clock = probes
+
+        client.get("/health")
+        clock[0] += server.HEALTH_CACHE_TTL
+        client.get("/health")
+        clock[0] += 1.0
+        client.get("/health")
+
+        assert calls == [1000.0, 1000.0 + server.HEALTH_CACHE_TTL]
+
+    def test_request_fields_not_cached(self, client, probes):
+        """Test request_id is fresh on every response, even from cache"""
+        first = client.get("/health").json()
+        second = client.get("/health").json()
+
+        assert first['request_id'] != second['request_id']
+
+class TestDemoPage:
+    """Test suite for GET / conditional requests"""
+
+    ETAG = '"5d41402abc4b2a76b9719d911017c592"'
+
+    @pytest.fixture
+    def demo(self, monkeypatch):
+        monkeypatch.setattr(server, "demo_page", (b"<html></html>", self.ETAG))
+
+    def test_serves_page_with_etag(self, client, demo):
+        """Test an unconditional request gets the page and its ETag"""
+        response = client.get("/")
+
+        assert response.status_code == 200
+        assert response.content == b"<html></html>"
+        assert response.headers["etag"] == self.ETAG
+
+    @pytest.mark.parametrize("if_none_match", [
+        ETAG,
+        "W/" + ETAG,
+        '"stale", ' + ETAG,
+        '"stale",W/' + ETAG,
+        "*",
+    ])
+    def test_matching_if_none_match_is_304(self, client, demo, if_none_match):
+        """Test listed, weak and wildcard validators all revalidate"""
+        response = client.get("/", headers={"If-None-Match": if_none_match})
+
+        assert response.status_code == 304
+        assert response.headers["etag"] == self.ETAG
+        assert response.content == b""
+
+    @pytest.mark.parametrize("if_none_match", [
+        '"stale"',
+        '"stale", W/"other"',
+        ETAG[:-1],
+    ])
+    def test_other_etags_get_the_page(self, client, demo, if_none_match):
+        """Test non-matching validators get a full 200"""
+        response = client.get("/", headers={"If-None-Match": if_none_match})
+
+        assert response.status_code == 200
+        assert response.content == b"<html></html>"
+
+    def test_missing_page_is_404(self, client, monkeypatch):
+        """Test a missing static/index.html is a 404, not a 500"""
+        monkeypatch.setattr(server, "demo_page", None)
+
+        response = client.get("/", headers={"If-None-Match": "*"})
+
+        assert response.status_code == 404
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])